@@ -25,23 +25,35 @@
 #
 # Set an environment variable named `LANDSCAPE_ANALYSIS_GH_TOKEN` to a [GitHub access token](https://docs.github.com/en/authentication/keeping-your-account-and-data-secure/managing-your-personal-access-tokens). E.g.: `export LANDSCAPE_ANALYSIS_GH_TOKEN=token_here`
 #
-# Use of this notebook also involves setup via https://github.com/ofek/pypinfo#installation. An environment variable is expected for pypinfo to work properly. For example: `export GOOGLE_APPLICATION_CREDENTIALS=/path/to/credentials.json`
+# Use of this notebook also involves Google BigQuery credentials for querying GitHub Archive (gharchive) event data (see https://github.com/ofek/pypinfo#installation for setup steps). An environment variable is expected for the credentials to work properly. For example: `export GOOGLE_APPLICATION_CREDENTIALS=/path/to/credentials.json`
+#
+# Some results are cached for the current day within `~/.cache/landscape-analysis/github-data` to help avoid repeated requests when re-running this notebook. Remove this directory to force new requests.
 
 # +
+import asyncio
+import collections
+import hashlib
+import itertools
 import json
 import os
 import pathlib
+import shutil
 import statistics
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 
-import awkward as ak
+import aiohttp
 import duckdb
+import nest_asyncio
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytz
+import requests
 from box import Box
-from github import Auth, Github, Repository
+from github import Auth, Github
 from google.cloud import bigquery
 
 # set github authorization and client
@@ -49,6 +61,16 @@ github_client = Github(
     auth=Auth.Token(os.environ.get("LANDSCAPE_ANALYSIS_GH_TOKEN")), per_page=100
 )
 
+# share a session for github graphql requests so that connections are reused
+github_graphql_session = requests.Session()
+github_graphql_session.headers.update(
+    {"Authorization": f"Bearer {os.environ.get('LANDSCAPE_ANALYSIS_GH_TOKEN')}"}
+)
+
+# set a cap for code search results gathered per project
+# (github search only provides up to the first 1000 results)
+github_code_search_limit = 1000
+
 # create google big query client
 gcbq_client = bigquery.Client()
 
@@ -63,6 +85,60 @@ current_year_month = current_datetime.strftime("%Y-%m")
 # Get the last two digits of the previous year
 previous_year_last_two_digits = (current_datetime - timedelta(days=365)).strftime("%y")
 
+# +
+# set a directory for caching results which are effectively unchanged within
+# a day (avoids repeated requests and rate limit use when re-running)
+cache_dir = pathlib.Path("~/.cache/landscape-analysis/github-data").expanduser()
+current_date_cache_dir = cache_dir / current_datetime.strftime("%Y-%m-%d")
+
+# remove cached results from previous days
+for stale_cache_dir in cache_dir.glob("*"):
+    if stale_cache_dir != current_date_cache_dir:
+        shutil.rmtree(stale_cache_dir)
+
+
+def get_daily_cache_file(key: str) -> pathlib.Path:
+    """
+    Returns the path for a cached result of the key from the current day.
+    """
+
+    return current_date_cache_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+
+def read_daily_cache(key: str) -> Optional[Any]:
+    """
+    Reads a cached JSON result for the key from the current day,
+    returning None where no result was cached.
+    """
+
+    cache_file = get_daily_cache_file(key)
+    return json.loads(cache_file.read_text()) if cache_file.is_file() else None
+
+
+def write_daily_cache(key: str, result: Any) -> Any:
+    """
+    Writes a JSON result for the key to the cache for the current day
+    and returns the result for further use.
+    """
+
+    current_date_cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_file = get_daily_cache_file(key)
+    cache_file.write_text(json.dumps(result))
+    return result
+
+
+def daily_cached(key: str, gather: Callable[[], Any]) -> Any:
+    """
+    Returns the cached result for the key from the current day
+    or gathers and caches the result otherwise.
+    """
+
+    cached_result = read_daily_cache(key)
+    return (
+        cached_result if cached_result is not None else write_daily_cache(key, gather())
+    )
+
+
 # +
 # gather projects data
 projects = Box.from_yaml(filename="data/target-projects.yaml").projects
@@ -74,9 +150,175 @@ loi_target_projects = [
 loi_target_projects
 # -
 
+
+# +
+# gather stargazer dates through concurrent requests to the GitHub API
+# (pygithub otherwise paginates through these results one page at a time)
+async def fetch_stargazers(
+    session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, full_name: str
+) -> List[str]:
+    """
+    Fetches the dates each stargazer starred a repository by
+    requesting all pages of results at once.
+    """
+
+    # use results from earlier today where possible
+    if (cached_stargazers := read_daily_cache(f"stargazers:{full_name}")) is not None:
+        return cached_stargazers
+
+    async def fetch_page(page: int):
+        async with semaphore:
+            async with session.get(
+                f"https://api.github.com/repos/{full_name}/stargazers",
+                params={"page": page, "per_page": 100},
+            ) as response:
+                response.raise_for_status()
+                return await response.json(), response.links
+
+    # use the first page to find how many pages there are through the link header
+    first_page, links = await fetch_page(1)
+    last_page = int(links["last"]["url"].query["page"]) if "last" in links else 1
+    other_pages = await asyncio.gather(
+        *[fetch_page(page) for page in range(2, last_page + 1)]
+    )
+
+    return write_daily_cache(
+        f"stargazers:{full_name}",
+        [
+            # keep the iso-8601 str from github to avoid datatyping issues
+            # and to allow later calculations without parsing the dates
+            stargazer["starred_at"]
+            for page in [first_page] + [page for page, _ in other_pages]
+            for stargazer in page
+        ],
+    )
+
+
+async def gather_stargazers(full_names: List[str]) -> Dict[str, List[str]]:
+    """
+    Gathers stargazer dates for many repositories concurrently.
+    """
+
+    # limit concurrent requests to help respect GitHub secondary rate limits
+    semaphore = asyncio.Semaphore(20)
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=20),
+        headers={
+            "Authorization": f"Bearer {os.environ.get('LANDSCAPE_ANALYSIS_GH_TOKEN')}",
+            # request the starred_at date alongside each stargazer
+            "Accept": "application/vnd.github.star+json",
+        },
+    ) as session:
+        results = await asyncio.gather(
+            *[fetch_stargazers(session, semaphore, name) for name in full_names]
+        )
+
+    return dict(zip(full_names, results))
+
+
+# allow for nested asyncio ops
+nest_asyncio.apply()
+
+stargazers_by_repo = asyncio.get_event_loop().run_until_complete(
+    gather_stargazers(
+        [
+            project["repo_url"].replace("https://github.com/", "")
+            for project in loi_target_projects
+        ]
+    )
+)
+# -
+
+
+# +
+def query_github_graphql(query: str) -> Dict[str, Any]:
+    """
+    Queries the GitHub GraphQL API, returning the data from the result.
+    """
+
+    response = github_graphql_session.post(
+        "https://api.github.com/graphql",
+        json={"query": query},
+    )
+    response.raise_for_status()
+    result = response.json()
+
+    # graphql may respond successfully with errors and no data (for example, on rate
+    # limits or timeouts), where only errors for objects not found are expected
+    unexpected_errors = [
+        error for error in result.get("errors", []) if error.get("type") != "NOT_FOUND"
+    ]
+    if result.get("data") is None or unexpected_errors:
+        raise Exception(
+            f"GitHub GraphQL query failed: {unexpected_errors or result.get('errors')}"
+        )
+
+    return result["data"]
+
+
+# gather details for target key personnel through a single GraphQL query
+# (instead of making one request per user)
+def gather_github_users(logins: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Gathers GitHub user details for many logins at once using
+    aliased user fields within a GraphQL query.
+    """
+
+    query = (
+        "{"
+        + " ".join(
+            f'user{idx}: user(login: "{login}") {{ databaseId name login }}'
+            for idx, login in enumerate(logins)
+        )
+        + "}"
+    )
+    users = query_github_graphql(query)
+
+    # key personnel are expected to exist, so raise where a login could not be found
+    missing_logins = [
+        login for idx, login in enumerate(logins) if users[f"user{idx}"] is None
+    ]
+    if missing_logins:
+        raise Exception(f"GitHub users not found: {missing_logins}")
+
+    return {
+        # note: the databaseId aligns with the id from the GitHub REST API
+        login: {
+            "id": users[f"user{idx}"]["databaseId"],
+            "name": users[f"user{idx}"]["name"],
+            "login": users[f"user{idx}"]["login"],
+        }
+        for idx, login in enumerate(logins)
+    }
+
+
+# gather each distinct login once, as key personnel may be shared across projects
+key_personnel_by_login = gather_github_users(
+    sorted(
+        {
+            login
+            for project in loi_target_projects
+            for login in project["target-key-personnel-gh-login"]
+        }
+    )
+)
+key_personnel_by_login
+# -
+
+
+# +
 # gather targeted data from GitHub
-tgt_github_metrics = [
-    {
+def fetch_project_metrics(project: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Gathers GitHub repository metrics for a single target project.
+    """
+
+    # make a request for github repo data with pygithub
+    repo = github_client.get_repo(
+        project["repo_url"].replace("https://github.com/", "")
+    )
+
+    return {
         "Project Name": repo.name,
         "GitHub Repo Full Name": repo.full_name,
         # gather repo data from github API
@@ -84,149 +326,219 @@ tgt_github_metrics = [
         "GitHub Repo Created Month": repo.created_at.strftime("%Y-%m"),
         "GitHub Stars": repo.stargazers_count,
         # find github stars for project by date
-        "GitHub Stars by Date": [
-            # convert to str to avoid datatyping issues
-            result.starred_at.strftime("%Y-%m-%d %H:%M:%S %Z")
-            for result in repo.get_stargazers_with_dates()
+        # (gathered concurrently ahead of time, see above)
+        "GitHub Stars by Date": stargazers_by_repo[
+            project["repo_url"].replace("https://github.com/", "")
         ],
         # this aligns with number of forks and is labeled the network count
         "GitHub Network Count": repo.network_count,
         # find where the project is used via targeted github code search
-        "GitHub Code Search Used By": list(
-            # gather distinct results (avoid repeats)
-            set(
-                [
+        "GitHub Code Search Used By": daily_cached(
+            f"code-search:{repo.full_name}",
+            lambda: list(
+                # gather distinct results (avoid repeats) without
+                # building an intermediate list
+                {
                     # include the full name of the repository
                     code.repository.full_name
-                    # search code by project name
-                    for code in github_client.search_code(query=repo.name.lower())
+                    # search code by project name within .py or .ipynb files
+                    # (filtering by extension within the query avoids fetching
+                    # pages of results for other file types)
+                    for extension in ("py", "ipynb")
+                    # stop at the code search limit to avoid requesting
+                    # pages beyond github's results
+                    for code in itertools.islice(
+                        github_client.search_code(
+                            query=f"{repo.name.lower()} extension:{extension}"
+                        ),
+                        github_code_search_limit,
+                    )
                     # check that the result isn't the project itself of this analysis
                     if code.repository.full_name.lower()
                     not in (
                         repo.full_name.lower(),
                         "wayscience/software-landscape-analysis",
                     )
-                    # check that the code file is of .py or .ipynb type
-                    and pathlib.Path(code.name).suffix in (".py", ".ipynb")
                     # check that the repository is not a fork
                     and not code.repository.fork
-                ]
-            )
+                }
+            ),
         ),
         # find all contributors to the project
-        "GitHub Contributors": [
-            {
-                "id": contributor.id,
-                "name": contributor.name,
-                "login": contributor.login,
-            }
-            for contributor in repo.get_contributors()
-        ],
+        "GitHub Contributors": daily_cached(
+            f"contributors:{repo.full_name}",
+            lambda: [
+                {
+                    "id": contributor.id,
+                    "name": contributor.name,
+                    "login": contributor.login,
+                }
+                for contributor in repo.get_contributors()
+            ],
+        ),
         # gather details for target personnel
         "GitHub Target Key Personnel": [
-            {"id": ghuser.id, "name": ghuser.name, "login": ghuser.login}
-            for ghuser in [
-                github_client.get_user(user)
-                for user in project["target-key-personnel-gh-login"]
-            ]
+            key_personnel_by_login[login]
+            for login in project["target-key-personnel-gh-login"]
         ],
     }
-    # make a request for github repo data with pygithub
-    for project, repo in [
-        (
-            project,
-            github_client.get_repo(
-                project["repo_url"].replace("https://github.com/", "")
-            ),
-        )
-        for project in loi_target_projects
-    ]
-]
-ak.Array(tgt_github_metrics)
+
+
+# gather the metrics for each project in parallel as the work is bound by network requests
+with ThreadPoolExecutor(max_workers=16) as executor:
+    tgt_github_metrics = list(executor.map(fetch_project_metrics, loi_target_projects))
+len(tgt_github_metrics)
+# -
 
 
 # +
 # gather key personnel contribution data from GitHub and gharchive
-def safely_query_github_repo_from_archive_data(
-    repo_full_name: str,
-) -> Optional[Repository.Repository]:
+def gather_github_repos(
+    full_names: List[str], batch_size: int = 50
+) -> Dict[str, Optional[Dict[str, Any]]]:
     """
-    Safely queries for github repo from archive data,
-    avoiding errors when exceptions are encountered by
-    returning None.
+    Gathers GitHub repository details for many repositories at once
+    using aliased repository fields within batched GraphQL queries,
+    returning None for repositories which could not be found.
     """
 
-    try:
-        return github_client.get_repo(repo_full_name)
-    except:
-        return None
-
+    repos = {}
+    for batch_start in range(0, len(full_names), batch_size):
+        batch = full_names[batch_start : batch_start + batch_size]
+        query = (
+            "{"
+            + " ".join(
+                f'repo{idx}: repository(owner: "{full_name.split("/")[0]}", '
+                f'name: "{full_name.split("/")[1]}") '
+                "{ nameWithOwner stargazerCount isFork }"
+                for idx, full_name in enumerate(batch)
+            )
+            + "}"
+        )
+        # note: repositories which are deleted or private are returned
+        # as null (alongside not found errors) and are treated as missing results
+        batch_results = query_github_graphql(query)
+        repos.update(
+            {
+                full_name: batch_results.get(f"repo{idx}")
+                for idx, full_name in enumerate(batch)
+            }
+        )
 
-tgt_github_metrics = [
-    dict(
-        project,
-        **{
-            # query for where the key personnel are contributing to
-            "GitHub Target Key Personnel Contributing To": [
-                {
-                    "repo.full_name": repo.full_name,
-                    "repo.stargazers_count": repo.stargazers_count,
-                }
-                for repo in [
-                    # gather data about the key personnel contributing repo
-                    safely_query_github_repo_from_archive_data(
-                        contribution_repo["repo.full_name"]
+    return repos
+
+
+# gather repos which key personnel contribute to from gharchive for all
+# projects through a single parameterized query (instead of one per project)
+contributing_repos_by_project = {}
+for row in gcbq_client.query(
+    f"""
+    /* gather distinct results for repositories by project */
+    SELECT DISTINCT
+        key_personnel.project_full_name,
+        /* note: repo.name here corresponds to org/repo_name
+        or aka 'full_name' */
+        events.repo.name AS repo_name
+    /* wildcard monthly references to seek last two years
+    using the where clause below */
+    FROM `githubarchive.month.20*` AS events
+    /* only look at users which are in target key personnel id's */
+    JOIN UNNEST(@key_personnel) AS key_personnel
+        ON events.actor.id = key_personnel.actor_id
+    WHERE
+        /* only look at push and pull request events */
+        events.type IN ('PushEvent', 'PullRequestEvent')
+        /* only look at the last two years of data */
+        AND (_TABLE_SUFFIX BETWEEN '{previous_year_last_two_digits}01'
+            AND '{current_year_last_two_digits}12')
+        /* skip events without a repo name */
+        AND events.repo.name IS NOT NULL
+        /* filter out repos which match the target project full name */
+        AND events.repo.name != key_personnel.project_full_name
+    """,
+    job_config=bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter(
+                "key_personnel",
+                "STRUCT",
+                [
+                    bigquery.StructQueryParameter(
+                        None,
+                        bigquery.ScalarQueryParameter(
+                            "project_full_name",
+                            "STRING",
+                            project["GitHub Repo Full Name"],
+                        ),
+                        bigquery.ScalarQueryParameter("actor_id", "INT64", user["id"]),
                     )
-                    for contribution_repo in [
-                        # form a data structure which can help reference the repo full name
-                        {"repo.full_name": row[0]}
-                        # gather data from gharchive about the key personnel contributions
-                        for row in gcbq_client.query(
-                            f"""
-                            /* gather distinct results for repositories */
-                            SELECT DISTINCT
-                                /* note: repo.name here corresponds to org/repo_name
-                                or aka 'full_name' */
-                                repo.name
-                            /* wildcard monthly references to seek last two years
-                            using the where clause below */
-                            FROM `githubarchive.month.20*`
-                            WHERE
-                                /* only look at users which are in target key personnel id's */
-                                actor.id IN ({', '.join([str(user['id']) for user in project['GitHub Target Key Personnel']])})
-                                /* only look at push and pull request events */
-                                AND type IN ('PushEvent', 'PullRequestEvent')
-                                /* only look at the last two years of data */
-                                AND (_TABLE_SUFFIX BETWEEN '{previous_year_last_two_digits}01'
-                                    AND '{current_year_last_two_digits}12')
-                                /* filter out repos which match the target project full name */
-                                AND repo.name NOT IN ('{project['GitHub Repo Full Name']}')
-                            """
-                        ).result()
-                    ]
-                ]
-                # only keep non-null results
-                if repo is not None
-                # only keep results which are not forks
-                and not repo.fork
-                # only keep results which have more than 0 stars
-                and repo.stargazers_count > 1
-            ],
-        },
+                    for project in tgt_github_metrics
+                    for user in project["GitHub Target Key Personnel"]
+                ],
+            ),
+        ]
+    ),
+).result():
+    contributing_repos_by_project.setdefault(row["project_full_name"], []).append(
+        row["repo_name"]
     )
-    for project in tgt_github_metrics
-]
-ak.Array(tgt_github_metrics)
+
+
+def gather_key_personnel_contributions(project: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Gathers repositories which the target key personnel
+    of a project are contributing to.
+    """
+
+    return {
+        # query for where the key personnel are contributing to
+        "GitHub Target Key Personnel Contributing To": [
+            {
+                "repo.full_name": repo["nameWithOwner"],
+                "repo.stargazers_count": repo["stargazerCount"],
+            }
+            # gather data about the key personnel contributing repos
+            # found within gharchive through batched graphql queries
+            for repo in gather_github_repos(
+                contributing_repos_by_project.get(project["GitHub Repo Full Name"], [])
+            ).values()
+            # only keep non-null results
+            if repo is not None
+            # only keep results which are not forks
+            and not repo["isFork"]
+            # only keep results which have more than 0 stars
+            and repo["stargazerCount"] > 1
+        ],
+    }
+
+
+# gather the contributions for each project in parallel using the same clients
+# and store them by repo full name for a single merge later
+with ThreadPoolExecutor(max_workers=16) as executor:
+    key_personnel_contributions = {
+        project["GitHub Repo Full Name"]: contributions
+        for project, contributions in zip(
+            tgt_github_metrics,
+            executor.map(gather_key_personnel_contributions, tgt_github_metrics),
+        )
+    }
+len(key_personnel_contributions)
 # -
 
+
+# +
 # gather dependents data from GitHub
-tgt_github_metrics = [
-    dict(
-        project,
-        **{
-            # gather github dependent data scraped from github-dependents-info
-            # (github api information otherwise appears to be private or undocumented)
-            "GitHub Dependents": json.loads(
+def gather_dependents(project: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Gathers GitHub dependents data for a project using
+    github-dependents-info.
+    """
+
+    return {
+        # gather github dependent data scraped from github-dependents-info
+        # (github api information otherwise appears to be private or undocumented)
+        "GitHub Dependents": daily_cached(
+            f"github-dependents-info:{project['GitHub Repo Full Name']}",
+            lambda: json.loads(
                 subprocess.run(
                     [
                         "github-dependents-info",
@@ -238,178 +550,142 @@ tgt_github_metrics = [
                     check=True,
                 ).stdout
             ),
-        },
-    )
-    for project in tgt_github_metrics
-]
-ak.Array(tgt_github_metrics)
+        ),
+    }
+
+
+# subprocess calls block on network requests and may run in parallel threads
+# and store them by repo full name for a single merge later
+with ThreadPoolExecutor(max_workers=16) as executor:
+    dependents = {
+        project["GitHub Repo Full Name"]: project_dependents
+        for project, project_dependents in zip(
+            tgt_github_metrics,
+            executor.map(gather_dependents, tgt_github_metrics),
+        )
+    }
+len(dependents)
+# -
 
 # +
 # add calculations for ease of analysis
-find_average = lambda nums: sum(nums) / len(nums) if len(nums) > 0 else None
+# (note: fmean calculates the average in a single pass over the values)
+find_average = lambda nums: statistics.fmean(nums) if len(nums) > 0 else None
 find_median = lambda nums: statistics.median(nums) if len(nums) > 0 else None
 
 
-def add_missing_months(
-    months_data: Dict[str, int], date_minimum: str, date_max: str
+def count_stargazers_by_period(
+    star_periods: collections.Counter,
+    freq: str,
+    period_format: str,
+    date_minimum: str,
+    date_max: str,
 ) -> Dict[str, int]:
     """
-    Adds and updates missing months data for
-    GitHub stargazer data (which only has records for non-zero counts)
+    Counts stargazers by period (months or years), including periods
+    between the minimum and max dates which had no new stargazers
+    (GitHub stargazer data only has records for non-zero counts).
     """
 
-    start_date = datetime.strptime(date_minimum, "%Y-%m")
-    end_date = datetime.strptime(date_max, "%Y-%m")
-
-    current_date = start_date
-
-    result = {}
-
-    while current_date <= end_date:
-        # Create a dictionary with YYYY-MM format
-        result[current_date.strftime("%Y-%m")] = 0
-
-        # Move to the next month
-        current_date += timedelta(days=32)
-        current_date = datetime(current_date.year, current_date.month, 1)
-
-    # Update the new dictionary with the values from the original dictionary
-    result.update(months_data)
-
-    return result
+    return {
+        # fill periods which had no new stargazers with 0's
+        period: star_periods.get(period, 0)
+        for period in pd.date_range(date_minimum, date_max, freq=freq).strftime(
+            period_format
+        )
+    }
 
 
-def add_missing_years(
-    years_data: Dict[str, int], date_minimum: str, date_max: str
-) -> Dict[str, int]:
+def count_stargazers_by_date(project: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Adds and updates missing years data for GitHub stargazer data
-    (which only has records for non-zero counts)
+    Counts stargazers by month and year from the dates
+    when stargazers were added to the project.
     """
 
-    start_date = int(datetime.strptime(date_minimum, "%Y-%m").year)
-    end_date = int(datetime.strptime(date_max, "%Y-%m").year)
-
-    current_year = start_date
-
-    result = {}
-
-    while current_year <= end_date:
-        # Create a dictionary with YYYY format
-        result[str(current_year)] = 0
+    return {
+        # convert a list of iso-8601 dates when stargazers were added to
+        # dictionary of months and star count for later calculations
+        # (slicing the dates provides the month without parsing them)
+        "GitHub Stargazers Count by Month": count_stargazers_by_period(
+            collections.Counter(
+                star_date[:7] for star_date in project["GitHub Stars by Date"]
+            ),
+            freq="MS",
+            period_format="%Y-%m",
+            date_minimum=project["GitHub Repo Created Month"],
+            date_max=current_year_month,
+        ),
+        # convert a list of iso-8601 dates when stargazers were added to
+        # dictionary of years and star count for later calculations
+        "GitHub Stargazers Count by Year": count_stargazers_by_period(
+            collections.Counter(
+                star_date[:4] for star_date in project["GitHub Stars by Date"]
+            ),
+            freq="YS",
+            period_format="%Y",
+            # use the year of the created month for a yearly range
+            date_minimum=project["GitHub Repo Created Month"][:4],
+            date_max=current_year_month,
+        ),
+    }
 
-        # Move to the next year
-        current_year += 1
 
-    # Update the new dictionary with the values from the original dictionary
-    result.update(years_data)
+def calculate_project_counts(project: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Calculates counts, averages, and medians from gathered
+    project data for ease of analysis.
+    """
 
-    return result
+    return {
+        "GitHub Contributor Total Count": len(project["GitHub Contributors"]),
+        "GitHub Dependency Graph Dependents Count": project["GitHub Dependents"][
+            "total_dependents_number"
+        ],
+        "GitHub Code Search Dependents Count": len(
+            project["GitHub Code Search Used By"]
+        ),
+        "GitHub Total Dependents Count": len(
+            # create a set of unique repo full_name entries
+            # from all dependents queries
+            {
+                *project["GitHub Code Search Used By"],
+                *(
+                    repo["name"]
+                    for repo in project["GitHub Dependents"][
+                        "all_public_dependent_repos"
+                    ]
+                ),
+            }
+        ),
+        "GitHub Stargazers Count by Month Average": find_average(
+            project["GitHub Stargazers Count by Month"].values()
+        ),
+        "GitHub Stargazers Count by Month Median": find_median(
+            project["GitHub Stargazers Count by Month"].values()
+        ),
+        "GitHub Stargazers Count by Year Average": find_average(
+            project["GitHub Stargazers Count by Year"].values()
+        ),
+        "GitHub Stargazers Count by Year Median": find_median(
+            project["GitHub Stargazers Count by Year"].values()
+        ),
+    }
 
 
-tgt_github_metrics = [
-    dict(
-        project,
-        **{
-            # convert a list of dates when stargazers were added to
-            # dictionary of months and star count for later calculations
-            "GitHub Stargazers Count by Month": add_missing_months(
-                {
-                    date_object.strftime("%Y-%m"): sum(
-                        1
-                        for d in (
-                            datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S %Z")
-                            for timestamp in project["GitHub Stars by Date"]
-                        )
-                        if d.strftime("%Y-%m") == date_object.strftime("%Y-%m")
-                    )
-                    for date_object in (
-                        datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S %Z")
-                        for timestamp in project["GitHub Stars by Date"]
-                    )
-                },
-                project["GitHub Repo Created Month"],
-                current_year_month,
-            ),
-            # convert a list of dates when stargazers were added to
-            # dictionary of years and star count for later calculations
-            "GitHub Stargazers Count by Year": add_missing_years(
-                {
-                    date_object.strftime("%Y"): sum(
-                        1
-                        for d in (
-                            datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S %Z")
-                            for timestamp in project["GitHub Stars by Date"]
-                        )
-                        if d.strftime("%Y") == date_object.strftime("%Y")
-                    )
-                    for date_object in (
-                        datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S %Z")
-                        for timestamp in project["GitHub Stars by Date"]
-                    )
-                },
-                project["GitHub Repo Created Month"],
-                current_year_month,
-            ),
-        },
-    )
-    for project in tgt_github_metrics
-]
-tgt_github_metrics = [
-    dict(
-        project,
-        **{
-            "GitHub Contributor Total Count": len(project["GitHub Contributors"]),
-            "GitHub Dependency Graph Dependents Count": project["GitHub Dependents"][
-                "total_dependents_number"
-            ],
-            "GitHub Code Search Dependents Count": len(
-                project["GitHub Code Search Used By"]
-            ),
-            "GitHub Total Dependents Count": len(
-                # create a list of unique repo full_name entries
-                # from all dependents queries
-                list(
-                    set(
-                        project["GitHub Code Search Used By"]
-                        + [
-                            repo["name"]
-                            for repo in project["GitHub Dependents"][
-                                "all_public_dependent_repos"
-                            ]
-                        ]
-                    )
-                )
-            ),
-            "GitHub Stargazers Count by Month Average": find_average(
-                [
-                    count
-                    for count in project["GitHub Stargazers Count by Month"].values()
-                ]
-            ),
-            "GitHub Stargazers Count by Month Median": find_median(
-                [
-                    count
-                    for count in project["GitHub Stargazers Count by Month"].values()
-                ]
-            ),
-            "GitHub Stargazers Count by Year Average": find_average(
-                [count for count in project["GitHub Stargazers Count by Year"].values()]
-            ),
-            "GitHub Stargazers Count by Year Median": find_median(
-                [count for count in project["GitHub Stargazers Count by Year"].values()]
-            ),
-        },
-    )
-    for project in tgt_github_metrics
-]
-ak.Array(tgt_github_metrics)
+# merge all gathered data into each project in a single pass
+for project in tgt_github_metrics:
+    project.update(key_personnel_contributions[project["GitHub Repo Full Name"]])
+    project.update(dependents[project["GitHub Repo Full Name"]])
+    project.update(count_stargazers_by_date(project))
+    project.update(calculate_project_counts(project))
+len(tgt_github_metrics)
 # -
 
-# export to parquet file
-ak.to_parquet(
-    array=ak.Array(tgt_github_metrics),
-    destination="data/loi-target-project-github-metrics.parquet",
+# export to parquet file directly through arrow
+pq.write_table(
+    table=pa.Table.from_pylist(tgt_github_metrics),
+    where="data/loi-target-project-github-metrics.parquet",
+    compression="zstd",
 )
 
 # depict results from the file
@@ -18,23 +18,93 @@
 #
 # ## Setup
 #
-# Use of this notebook involves setup via https://github.com/ofek/pypinfo#installation. An environment variable is expected for pypinfo to work properly. For example: `export GOOGLE_APPLICATION_CREDENTIALS=/path/to/credentials.json`
+# Use of this notebook involves Google BigQuery credentials for querying PyPI download data (see https://github.com/ofek/pypinfo#installation for setup steps). An environment variable is expected for the credentials to work properly. For example: `export GOOGLE_APPLICATION_CREDENTIALS=/path/to/credentials.json`
+#
+# PyPI download results are cached for the current day within `~/.cache/landscape-analysis/package-metrics` to help avoid repeated BigQuery jobs when re-running this notebook. Remove this directory to force new queries.
 
 # +
+import functools
+import hashlib
 import json
 import os
+import pathlib
+import re
+import shutil
 import statistics
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import awkward as ak
 import condastats.cli as condastats_cli
 import duckdb
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytz
 from box import Box
+from google.cloud import bigquery
+
+# create google big query client
+gcbq_client = bigquery.Client()
+
+# get the current datetime
+tz = pytz.timezone("UTC")
+current_datetime = datetime.now(tz)
+
+# +
+# set a directory for caching results which are effectively unchanged within
+# a day (avoids repeated bigquery jobs when re-running)
+cache_dir = pathlib.Path("~/.cache/landscape-analysis/package-metrics").expanduser()
+current_date_cache_dir = cache_dir / current_datetime.strftime("%Y-%m-%d")
+
+# remove cached results from previous days
+for stale_cache_dir in cache_dir.glob("*"):
+    if stale_cache_dir != current_date_cache_dir:
+        shutil.rmtree(stale_cache_dir)
+
+
+def get_daily_cache_file(key: str) -> pathlib.Path:
+    """
+    Returns the path for a cached result of the key from the current day.
+    """
+
+    return current_date_cache_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+
+def read_daily_cache(key: str) -> Optional[Any]:
+    """
+    Reads a cached JSON result for the key from the current day,
+    returning None where no result was cached.
+    """
+
+    cache_file = get_daily_cache_file(key)
+    return json.loads(cache_file.read_text()) if cache_file.is_file() else None
+
+
+def write_daily_cache(key: str, result: Any) -> Any:
+    """
+    Writes a JSON result for the key to the cache for the current day
+    and returns the result for further use.
+    """
+
+    current_date_cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_file = get_daily_cache_file(key)
+    cache_file.write_text(json.dumps(result))
+    return result
+
+
+def daily_cached(key: str, gather: Callable[[], Any]) -> Any:
+    """
+    Returns the cached result for the key from the current day
+    or gathers and caches the result otherwise.
+    """
+
+    cached_result = read_daily_cache(key)
+    return (
+        cached_result if cached_result is not None else write_daily_cache(key, gather())
+    )
+
 
 # +
 # gather projects data
@@ -49,19 +119,19 @@ loi_target_projects = [
 loi_target_projects
 
 # +
-# create a str for targeting the specific projects
-project_sql_str = ", ".join(["'" + project + "'" for project in loi_target_projects])
-
 # filter results of github stats to find the project creation date for use in filtering below
+# (targeting the specific lowercase project names through a list parameter
+# which is unnested for a hash semi-join rather than a per-row list scan)
 with duckdb.connect() as ddb:
-    loi_target_project_years = ddb.query(
-        f"""
+    loi_target_project_years = ddb.execute(
+        """
     SELECT
         ghstats."Project Name",
         ghstats."Date Created"
     FROM read_parquet('data/project-github-metrics.parquet') as ghstats
-    WHERE LOWER(ghstats."Project Name") in ({project_sql_str})
+    WHERE LOWER(ghstats."Project Name") IN (SELECT UNNEST(?))
     """,
+        [loi_target_projects],
     ).df()
 
 loi_target_project_years
@@ -76,120 +146,169 @@ pkg_metrics = loi_target_project_years[
 ].to_dict(orient="records")
 pkg_metrics
 
-# gather various PyPI metrics through pypinfo
+# +
+# gather various PyPI metrics from the PyPI downloads dataset within BigQuery
+# (using one query per dimension for all projects rather than pypinfo calls
+# for each project and dimension). Fields and filters align with pypinfo.
+pypi_queries = {
+    # gather total downloads
+    "pypi_downloads_total": {"fields": [], "order_by": "download_count DESC"},
+    # gather downloads by year and month, ordered by month
+    "pypi_downloads_by_month": {
+        "fields": [
+            ('FORMAT_TIMESTAMP("%Y-%m", downloads.timestamp)', "download_month")
+        ],
+        "order_by": "download_month",
+    },
+    # gather downloads by software version
+    "pypi_downloads_by_version": {
+        "fields": [("downloads.file.version", "version")],
+        "order_by": "download_count DESC",
+    },
+    # gather downloads by python version
+    "pypi_downloads_by_pyversion": {
+        "fields": [
+            (
+                r"REGEXP_EXTRACT(downloads.details.python, r'^([^\.]+\.[^\.]+)')",
+                "python_version",
+            )
+        ],
+        "order_by": "download_count DESC",
+    },
+    # gather downloads by country
+    "pypi_downloads_by_country": {
+        "fields": [("downloads.country_code", "country")],
+        "order_by": "download_count DESC",
+    },
+    # gather downloads by system and distro type
+    "pypi_downloads_by_system_and_distro": {
+        "fields": [
+            ("downloads.details.system.name", "system_name"),
+            ("downloads.details.distro.name", "distro_name"),
+        ],
+        "order_by": "download_count DESC",
+    },
+}
+
+
+def normalize_pypi_name(name: str) -> str:
+    """
+    Normalizes a package name in the same way as PyPI (see PEP 503).
+    """
+
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def query_pypi_downloads(
+    fields: List[Tuple[str, str]], order_by: str
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Queries PyPI download counts grouped by the fields for all
+    target projects, returning rows of results by project.
+    """
+
+    rows = gcbq_client.query(
+        f"""
+        SELECT
+            downloads.file.project AS project,
+            {"".join(f"{expression} AS {alias}, " for expression, alias in fields)}
+            COUNT(*) AS download_count
+        FROM `bigquery-public-data.pypi.file_downloads` AS downloads
+        /* only look at downloads of the target projects */
+        JOIN UNNEST(@projects) AS target_project
+            ON downloads.file.project = target_project.name
+        WHERE
+            /* constant filter which helps skip partitions from before any project existed */
+            downloads.timestamp >= TIMESTAMP(@min_start_date)
+            /* only look at downloads from project creation up until yesterday */
+            AND downloads.timestamp >= TIMESTAMP(target_project.start_date)
+            AND downloads.timestamp < TIMESTAMP(CURRENT_DATE())
+            /* only look at pip installs */
+            AND downloads.details.installer.name = 'pip'
+        GROUP BY {", ".join(["project"] + [alias for _, alias in fields])}
+        /* limit the number of results for each project */
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY downloads.file.project ORDER BY COUNT(*) DESC
+        ) <= 1000
+        ORDER BY project, {order_by}
+        """,
+        job_config=bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter(
+                    "projects",
+                    "STRUCT",
+                    [
+                        bigquery.StructQueryParameter(
+                            None,
+                            bigquery.ScalarQueryParameter(
+                                "name",
+                                "STRING",
+                                normalize_pypi_name(project["Project Name"]),
+                            ),
+                            bigquery.ScalarQueryParameter(
+                                "start_date",
+                                "DATE",
+                                datetime.strptime(
+                                    project["Date Created YYYY-MM"], "%Y-%m"
+                                ).date(),
+                            ),
+                        )
+                        for project in pkg_metrics
+                    ],
+                ),
+                bigquery.ScalarQueryParameter(
+                    "min_start_date",
+                    "DATE",
+                    datetime.strptime(
+                        min(project["Date Created YYYY-MM"] for project in pkg_metrics),
+                        "%Y-%m",
+                    ).date(),
+                ),
+            ]
+        ),
+    ).result()
+
+    results = {}
+    for row in rows:
+        results.setdefault(row["project"], []).append(
+            {key: val for key, val in row.items() if key != "project"}
+        )
+
+    return results
+
+
+# run each query in parallel as the work is bound by waiting on bigquery jobs
+with ThreadPoolExecutor(max_workers=len(pypi_queries)) as executor:
+    pypi_futures = {
+        # use results from earlier today for the same metric and projects where possible
+        metric: executor.submit(
+            daily_cached,
+            f"pypi:{metric}:{','.join(sorted(loi_target_projects))}",
+            functools.partial(query_pypi_downloads, query["fields"], query["order_by"]),
+        )
+        for metric, query in pypi_queries.items()
+    }
+pypi_results = {metric: future.result() for metric, future in pypi_futures.items()}
+
+# projects without pip downloads have no grouped rows, so fill in the
+# single zero count row which an ungrouped total would have returned
+pypi_default_results = {"pypi_downloads_total": [{"download_count": 0}]}
+
 pkg_metrics = [
     dict(
         project,
         **{
-            # gather total downloads
-            "pypi_downloads_total": json.loads(
-                subprocess.run(
-                    [
-                        "pypinfo",
-                        "--json",
-                        "--start-date",
-                        project["Date Created YYYY-MM"],
-                        "--limit",
-                        "1000",
-                        project["Project Name"],
-                    ],
-                    capture_output=True,
-                    check=True,
-                ).stdout
-            )["rows"],
-            # gather downloads by year and month, ordered by month
-            "pypi_downloads_by_month": json.loads(
-                subprocess.run(
-                    [
-                        "pypinfo",
-                        "--json",
-                        "--start-date",
-                        project["Date Created YYYY-MM"],
-                        "--limit",
-                        "1000",
-                        "--order",
-                        "download_month",
-                        project["Project Name"],
-                        "month",
-                    ],
-                    capture_output=True,
-                    check=True,
-                ).stdout
-            )["rows"],
-            # gather downloads by software version
-            "pypi_downloads_by_version": json.loads(
-                subprocess.run(
-                    [
-                        "pypinfo",
-                        "--json",
-                        "--start-date",
-                        project["Date Created YYYY-MM"],
-                        "--limit",
-                        "1000",
-                        project["Project Name"],
-                        "version",
-                    ],
-                    capture_output=True,
-                    check=True,
-                ).stdout
-            )["rows"],
-            # gather downloads by python version
-            "pypi_downloads_by_pyversion": json.loads(
-                subprocess.run(
-                    [
-                        "pypinfo",
-                        "--json",
-                        "--start-date",
-                        project["Date Created YYYY-MM"],
-                        "--limit",
-                        "1000",
-                        project["Project Name"],
-                        "pyversion",
-                    ],
-                    capture_output=True,
-                    check=True,
-                ).stdout
-            )["rows"],
-            # gather downloads by country
-            "pypi_downloads_by_country": json.loads(
-                subprocess.run(
-                    [
-                        "pypinfo",
-                        "--json",
-                        "--start-date",
-                        project["Date Created YYYY-MM"],
-                        "--limit",
-                        "1000",
-                        project["Project Name"],
-                        "country",
-                    ],
-                    capture_output=True,
-                    check=True,
-                ).stdout
-            )["rows"],
-            # gather downloads by system and distro type
-            "pypi_downloads_by_system_and_distro": json.loads(
-                subprocess.run(
-                    [
-                        "pypinfo",
-                        "--json",
-                        "--start-date",
-                        project["Date Created YYYY-MM"],
-                        "--limit",
-                        "1000",
-                        project["Project Name"],
-                        "system",
-                        "distro",
-                    ],
-                    capture_output=True,
-                    check=True,
-                ).stdout
-            )["rows"],
+            metric: results.get(
+                normalize_pypi_name(project["Project Name"]),
+                pypi_default_results.get(metric, []),
+            )
+            for metric, results in pypi_results.items()
         },
     )
     for project in pkg_metrics
 ]
-ak.Array(pkg_metrics)
+len(pkg_metrics)
+# -
 
 
 # +
@@ -216,60 +335,66 @@ def condastats_handler(
     return None
 
 
+def gather_condastats(
+    condastats_func: Callable[..., Any], package: str, start_month: str, **kwargs
+) -> Dict[str, Any]:
+    """
+    Gathers and handles results from a condastats function
+    for a package from the start month onwards.
+    """
+
+    return condastats_handler(
+        condastats_result=condastats_func(
+            package=package, start_month=start_month, **kwargs
+        ),
+        package_name=package,
+    )
+
+
+# set the condastats functions and arguments used for each metric
+condastats_queries = {
+    # gather total downloads
+    "conda_downloads_total": (condastats_cli.overall, {}),
+    # gather downloads by month
+    "conda_downloads_by_month": (condastats_cli.overall, {"monthly": True}),
+    # gather downloads by python version
+    "conda_downloads_by_pyversion": (condastats_cli.pkg_python, {}),
+    # gather downloads by version
+    "conda_downloads_by_version": (condastats_cli.pkg_version, {}),
+    # gather downloads by system and distro type
+    "conda_downloads_by_platform": (condastats_cli.pkg_platform, {}),
+}
+
+# gather the metrics in parallel as each call is bound by downloading data
+with ThreadPoolExecutor(max_workers=10) as executor:
+    condastats_futures = {
+        (idx, metric): executor.submit(
+            gather_condastats, condastats_func, package, start_month, **kwargs
+        )
+        # prepare the package name and start month once for each project
+        for idx, (package, start_month) in enumerate(
+            (project["Project Name"].lower(), project["Date Created YYYY-MM"])
+            for project in pkg_metrics
+        )
+        for metric, (condastats_func, kwargs) in condastats_queries.items()
+    }
+
 pkg_metrics = [
     dict(
         project,
         **{
-            # gather total downloads
-            "conda_downloads_total": condastats_handler(
-                condastats_result=condastats_cli.overall(
-                    package=project["Project Name"].lower(),
-                    start_month=project["Date Created YYYY-MM"],
-                ),
-                package_name=project["Project Name"].lower(),
-            ),
-            # gather downloads by month
-            "conda_downloads_by_month": condastats_handler(
-                condastats_result=condastats_cli.overall(
-                    package=project["Project Name"].lower(),
-                    start_month=project["Date Created YYYY-MM"],
-                    monthly=True,
-                ),
-                package_name=project["Project Name"].lower(),
-            ),
-            # gather downloads by python version
-            "conda_downloads_by_pyversion": condastats_handler(
-                condastats_result=condastats_cli.pkg_python(
-                    package=project["Project Name"].lower(),
-                    start_month=project["Date Created YYYY-MM"],
-                ),
-                package_name=project["Project Name"].lower(),
-            ),
-            # gather downloads by version
-            "conda_downloads_by_version": condastats_handler(
-                condastats_result=condastats_cli.pkg_version(
-                    package=project["Project Name"].lower(),
-                    start_month=project["Date Created YYYY-MM"],
-                ),
-                package_name=project["Project Name"].lower(),
-            ),
-            # gather downloads by system and distro type
-            "conda_downloads_by_platform": condastats_handler(
-                condastats_result=condastats_cli.pkg_platform(
-                    package=project["Project Name"].lower(),
-                    start_month=project["Date Created YYYY-MM"],
-                ),
-                package_name=project["Project Name"].lower(),
-            ),
+            metric: condastats_futures[(idx, metric)].result()
+            for metric in condastats_queries
         },
     )
-    for project in pkg_metrics
+    for idx, project in enumerate(pkg_metrics)
 ]
-ak.Array(pkg_metrics)
+len(pkg_metrics)
 
 # +
 # build functions for average and median calculations
-find_average = lambda nums: sum(nums) / len(nums) if len(nums) > 0 else None
+# (note: fmean calculates the average in a single pass over the values)
+find_average = lambda nums: statistics.fmean(nums) if len(nums) > 0 else None
 find_median = lambda nums: statistics.median(nums) if len(nums) > 0 else None
 
 pkg_metrics = [
@@ -296,19 +421,13 @@ pkg_metrics = [
             ),
             # gather conda average from the download counts per month
             "conda_downloads_monthly_average": find_average(
-                [
-                    downloads
-                    for downloads in project["conda_downloads_by_month"].values()
-                ]
+                project["conda_downloads_by_month"].values()
             )
             if project["conda_downloads_by_month"]
             else None,
             # gather conda median from the download counts per month
             "conda_downloads_monthly_median": find_median(
-                [
-                    downloads
-                    for downloads in project["conda_downloads_by_month"].values()
-                ]
+                project["conda_downloads_by_month"].values()
             )
             if project["conda_downloads_by_month"]
             else None,
@@ -316,13 +435,14 @@ pkg_metrics = [
     )
     for project in pkg_metrics
 ]
-ak.Array(pkg_metrics)
+len(pkg_metrics)
 # -
 
-# export to parquet file
-ak.to_parquet(
-    array=ak.Array(pkg_metrics),
-    destination="data/loi-target-project-package-metrics.parquet",
+# export to parquet file directly through arrow
+pq.write_table(
+    table=pa.Table.from_pylist(pkg_metrics),
+    where="data/loi-target-project-package-metrics.parquet",
+    compression="zstd",
 )
 
 # depict results from the file
@@ -19,7 +19,10 @@
 
 # +
 import os
-from typing import List
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
 
 import awkward as ak
 import duckdb
@@ -27,8 +30,8 @@ import numpy as np
 import pandas as pd
 from biorxiv_retriever import BiorxivRetriever
 from box import Box
+from rapidfuzz import fuzz, process
 from scholarly import scholarly
-from thefuzz import fuzz
 
 # +
 # gather projects data
@@ -43,19 +46,19 @@ loi_target_projects = [
 loi_target_projects
 
 # +
-# create a str for targeting the specific projects
-project_sql_str = ", ".join(["'" + project + "'" for project in loi_target_projects])
-
 # filter results of github stats to find the project creation date for use in filtering below
+# (targeting the specific lowercase project names through a list parameter
+# which is unnested for a hash semi-join rather than a per-row list scan)
 with duckdb.connect() as ddb:
-    loi_target_project_years = ddb.query(
-        f"""
+    loi_target_project_years = ddb.execute(
+        """
     SELECT
         ghstats."Project Name",
         ghstats."Date Created"
     FROM read_parquet('data/project-github-metrics.parquet') as ghstats
-    WHERE LOWER(ghstats."Project Name") in ({project_sql_str})
+    WHERE LOWER(ghstats."Project Name") IN (SELECT UNNEST(?))
     """,
+        [loi_target_projects],
     ).df()
 
 loi_target_project_years
@@ -75,51 +78,81 @@ pub_metrics = loi_target_project_years.to_dict(orient="records")
 pub_metrics
 
 # +
-# expand the records with Google Scholar results from BiorxivRetriever pkg
-pub_metrics = [
-    dict(
-        project,
-        **{
-            "google_scholar_search_results": [
-                result
-                for result in scholarly.search_pubs(
-                    # wrap the query in quotes to isolate as exact matches only
-                    query=f'"{project["Project Name"]}"',
-                    # specify a minimum year for the query
-                    # (we shouldn't include results which were published
-                    # before the project existed)
-                    year_low=project["Date Created Year"],
-                )
-            ]
-        },
-    )
-    for project in pub_metrics
-]
+# gather Google Scholar results through the Scholarly pkg
+# (Google Scholar aggressively throttles requests so we limit concurrency)
+scholar_semaphore = threading.Semaphore(2)
 
-# show the len of the results for each project
-{
-    project["Project Name"]: len(project["google_scholar_search_results"])
-    for project in pub_metrics
-}
 
-# +
-# expand the records with biorxiv results from Scholarly pkg
+def gather_google_scholar_results(project: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Gathers Google Scholar search results for a project.
+    """
+
+    with scholar_semaphore:
+        return [
+            # only keep the fields which are used below
+            # (avoiding storage of unused author and citation details)
+            {"bib": {"title": result["bib"]["title"]}, "pub_url": result.get("pub_url")}
+            for result in scholarly.search_pubs(
+                # wrap the query in quotes to isolate as exact matches only
+                query=f'"{project["Project Name"]}"',
+                # specify a minimum year for the query
+                # (we shouldn't include results which were published
+                # before the project existed)
+                year_low=project["Date Created Year"],
+            )
+        ]
+
+
+# gather biorxiv results through the BiorxivRetriever pkg
 biorxiv_retriever = BiorxivRetriever()
 
+
+def gather_biorxiv_results(project: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Gathers bioRxiv search results for a project which mention
+    the project within the full text of the paper.
+    """
+
+    # compile a case-insensitive pattern for the project name to search
+    # the full text without creating lowercase copies of it
+    project_name_pattern = re.compile(
+        re.escape(project["Project Name"]), flags=re.IGNORECASE
+    )
+
+    return [
+        # exclude full_text from the data we store (only use for filtering)
+        {key: val for key, val in paper.items() if key != "full_text"}
+        # gather results from biorxiv search query
+        for paper in biorxiv_retriever.query(
+            f'"{project["Project Name"]}"', metadata=True, full_text=True
+        )
+        # only include the paper result if the project name is found within the full text
+        if project_name_pattern.search(paper["full_text"])
+    ]
+
+
+# query both sources for all projects in parallel as the work is bound by network requests
+with ThreadPoolExecutor(max_workers=8) as executor:
+    search_futures = {
+        (project["Project Name"], result_key): executor.submit(gather_results, project)
+        for project in pub_metrics
+        for result_key, gather_results in (
+            ("google_scholar_search_results", gather_google_scholar_results),
+            ("biorxiv_search_results", gather_biorxiv_results),
+        )
+    }
+
+# expand the records with the results from each source
 pub_metrics = [
     dict(
         project,
         **{
-            "biorxiv_search_results": [
-                # exclude full_text from the data we store (only use for filtering)
-                {key: val for key, val in paper.items() if key != "full_text"}
-                # gather results from biorxiv search query
-                for paper in biorxiv_retriever.query(
-                    f'"{project["Project Name"]}"', metadata=True, full_text=True
-                )
-                # only include the paper result if the project name is found within the full text
-                if project["Project Name"].lower() in paper["full_text"].lower()
-            ],
+            result_key: search_futures[(project["Project Name"], result_key)].result()
+            for result_key in (
+                "google_scholar_search_results",
+                "biorxiv_search_results",
+            )
         },
     )
     for project in pub_metrics
@@ -127,7 +160,10 @@ pub_metrics = [
 
 # show the len of the results for each project
 {
-    project["Project Name"]: len(project["biorxiv_search_results"])
+    project["Project Name"]: {
+        "google_scholar_search_results": len(project["google_scholar_search_results"]),
+        "biorxiv_search_results": len(project["biorxiv_search_results"]),
+    }
     for project in pub_metrics
 }
 # -
@@ -174,22 +210,26 @@ def return_distinct_values_by_threshold(
 ) -> List[str]:
     """
     Finds and returns a new list of distinct values based on
-    record linkage via Levenshtein distance.
+    record linkage via Levenshtein distance, keeping the first
+    occurrence of values which are similar to one another.
     """
-    distinct_list = []
-
-    # compare every value pair-wise
-    for i in range(len(string_list)):
-        for j in range(i + 1, len(string_list)):
-            if (
-                # if the value is distinct (below the threshold of similarity)
-                # and not yet included in the similar list, append it to the result
-                fuzz.ratio(string_list[i], string_list[j]) <= threshold
-                and string_list[i] not in distinct_list
-            ):
-                distinct_list.append((string_list[i]))
-
-    return distinct_list
+
+    if len(string_list) == 0:
+        return []
+
+    # compare every value pair-wise at once through a similarity matrix
+    similarity = process.cdist(
+        string_list, string_list, scorer=fuzz.ratio, dtype=np.uint8, workers=-1
+    )
+
+    distinct_indices = []
+    for idx in range(len(string_list)):
+        # if the value is distinct (below the threshold of similarity)
+        # from all values already included in the result, include it
+        if (similarity[idx, distinct_indices] <= threshold).all():
+            distinct_indices.append(idx)
+
+    return [string_list[idx] for idx in distinct_indices]
 
 
 pub_metrics = [
@@ -19,13 +19,23 @@
 # ## Setup
 #
 # Set an environment variable named `LANDSCAPE_ANALYSIS_GH_TOKEN` to a [GitHub access token](https://docs.github.com/en/authentication/keeping-your-account-and-data-secure/managing-your-personal-access-tokens). E.g.: `export LANDSCAPE_ANALYSIS_GH_TOKEN=token_here`
+#
+# GitHub results are cached for the current day within `~/.cache/landscape-analysis/project-github-metrics` to help avoid repeated requests when re-running this notebook. Remove this directory to force new requests.
 
 # +
+import hashlib
+import json
 import os
+import pathlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import duckdb
 import pandas as pd
 import pytz
+import requests
+import yaml
 from box import Box
 from github import Auth, Github
 
@@ -33,13 +43,82 @@ from github import Auth, Github
 github_client = Github(
     auth=Auth.Token(os.environ.get("LANDSCAPE_ANALYSIS_GH_TOKEN")), per_page=100
 )
+
+# share a session for github graphql requests so that connections are reused
+github_graphql_session = requests.Session()
+github_graphql_session.headers.update(
+    {"Authorization": f"Bearer {os.environ.get('LANDSCAPE_ANALYSIS_GH_TOKEN')}"}
+)
+
 # get the current datetime
 tz = pytz.timezone("UTC")
 current_datetime = datetime.now(tz)
 
 # +
-# gather projects data
-projects = Box.from_yaml(filename="data/projects.yaml").projects
+# set a directory for caching results which are effectively unchanged within
+# a day (avoids repeated requests and rate limit use when re-running)
+cache_dir = pathlib.Path(
+    "~/.cache/landscape-analysis/project-github-metrics"
+).expanduser()
+current_date_cache_dir = cache_dir / current_datetime.strftime("%Y-%m-%d")
+
+# remove cached results from previous days
+for stale_cache_dir in cache_dir.glob("*"):
+    if stale_cache_dir != current_date_cache_dir:
+        shutil.rmtree(stale_cache_dir)
+
+
+def get_daily_cache_file(key):
+    """
+    Returns the path for a cached result of the key from the current day.
+    """
+
+    return current_date_cache_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+
+def read_daily_cache(key):
+    """
+    Reads a cached JSON result for the key from the current day,
+    returning None where no result was cached.
+    """
+
+    cache_file = get_daily_cache_file(key)
+    return json.loads(cache_file.read_text()) if cache_file.is_file() else None
+
+
+def write_daily_cache(key, result):
+    """
+    Writes a JSON result for the key to the cache for the current day
+    and returns the result for further use.
+    """
+
+    current_date_cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_file = get_daily_cache_file(key)
+    cache_file.write_text(json.dumps(result))
+    return result
+
+
+def daily_cached(key, gather):
+    """
+    Returns the cached result for the key from the current day
+    or gathers and caches the result otherwise.
+    """
+
+    cached_result = read_daily_cache(key)
+    return (
+        cached_result if cached_result is not None else write_daily_cache(key, gather())
+    )
+
+
+# +
+# gather projects data, parsing with the libyaml c extension where available
+with open("data/projects.yaml", "r") as projects_file:
+    projects = Box(
+        yaml.load(
+            projects_file,
+            Loader=yaml.CSafeLoader if yaml.__with_libyaml__ else yaml.SafeLoader,
+        )
+    ).projects
 
 # check the number of projects
 print("number of projects: ", len(projects))
@@ -49,140 +128,268 @@ print("number of projects: ", len(projects))
 projects[0].keys()
 
 
-def try_to_detect_license(repo):
+def parse_github_datetime(github_datetime):
+    """
+    Parses an ISO-8601 datetime str from the GitHub GraphQL API
+    as a UTC datetime, returning None when no datetime exists.
+    """
+
+    return (
+        datetime.strptime(github_datetime, "%Y-%m-%dT%H:%M:%SZ").replace(
+            tzinfo=pytz.UTC
+        )
+        if github_datetime is not None
+        else None
+    )
+
+
+def query_github_graphql(query):
     """
-    Tries to detect the license from GitHub API
+    Queries the GitHub GraphQL API, returning the data from the result.
     """
 
-    try:
-        return repo.get_license().license.spdx_id
-    except:
-        return None
+    response = github_graphql_session.post(
+        "https://api.github.com/graphql",
+        json={"query": query},
+    )
+    response.raise_for_status()
+    result = response.json()
 
+    # graphql may respond successfully with errors and no data (for example, on rate
+    # limits or timeouts), where only errors for repositories not found are expected
+    unexpected_errors = [
+        error for error in result.get("errors", []) if error.get("type") != "NOT_FOUND"
+    ]
+    if result.get("data") is None or unexpected_errors:
+        raise Exception(
+            f"GitHub GraphQL query failed: {unexpected_errors or result.get('errors')}"
+        )
+
+    return result["data"]
 
-def try_to_gather_commit_count(repo):
+
+def gather_rest_repo_data(full_name):
     """
-    Tries to detect commit count of repo from GitHub API
+    Gathers repo data which isn't available through GraphQL
+    from the GitHub REST API.
     """
 
-    try:
-        return len(list(repo.get_commits()))
-    except:
-        return 0
+    rest_repo = github_client.get_repo(full_name)
+    return {
+        "network_count": rest_repo.network_count,
+        "contributors_count": rest_repo.get_contributors().totalCount,
+    }
 
 
-def try_to_gather_most_recent_commit_date(repo):
+def gather_github_repos(full_names, batch_size=50):
     """
-    Tries to detect most recent commit date of repo from GitHub API
+    Gathers GitHub repository data for many repositories at once
+    using aliased repository fields within batched GraphQL queries
+    (instead of making several REST requests for each repository).
     """
 
-    try:
-        return repo.pushed_at.replace(tzinfo=pytz.UTC)
-    except:
-        return None
+    repos = {}
+    for batch_start in range(0, len(full_names), batch_size):
+        batch = full_names[batch_start : batch_start + batch_size]
+        query = (
+            "{"
+            + " ".join(
+                f'repo{idx}: repository(owner: "{full_name.split("/")[0]}", '
+                f'name: "{full_name.split("/")[1]}") {{'
+                """
+                databaseId name homepageUrl url description
+                stargazerCount forkCount diskUsage isArchived createdAt pushedAt
+                watchers { totalCount }
+                issues(states: OPEN) { totalCount }
+                pullRequests(states: OPEN) { totalCount }
+                licenseInfo { spdxId }
+                repositoryTopics(first: 100) { nodes { topic { name } } }
+                owner { __typename login }
+                languages(first: 100) { edges { size node { name } } }
+                }"""
+                for idx, full_name in enumerate(batch)
+            )
+            + "}"
+        )
+        # note: repositories which could not be found are returned
+        # as null (alongside errors) and are treated as missing results
+        batch_results = daily_cached(
+            f"graphql:{query}", lambda: query_github_graphql(query)
+        )
+        repos.update(
+            {
+                full_name: batch_results.get(f"repo{idx}")
+                for idx, full_name in enumerate(batch)
+            }
+        )
+
+    return repos
+
+
+def gather_project_repo_data(project):
+    """
+    Gathers repo data for a project from the GitHub API,
+    creating a record for a dataframe.
+    """
+
+    full_name = project.repo_url.replace("https://github.com/", "")
+    # use repo data gathered through batched graphql queries
+    repo = repos[full_name]
+    # use repo data which isn't available through graphql
+    # from earlier today where possible
+    rest_repo = daily_cached(
+        f"rest-repo:{full_name}", lambda: gather_rest_repo_data(full_name)
+    )
+
+    return {
+        "Project Name": repo["name"],
+        # note: the databaseId aligns with the id from the GitHub REST API
+        "GitHub Repository ID": repo["databaseId"],
+        "Project Homepage": repo["homepageUrl"],
+        "Project Repo URL": repo["url"],
+        "Project Landscape Category": project.category,
+        "GitHub Stars": repo["stargazerCount"],
+        "GitHub Forks": repo["forkCount"],
+        "GitHub Subscribers": repo["watchers"]["totalCount"],
+        # note: open issues from the GitHub REST API include pull requests
+        "GitHub Open Issues": repo["issues"]["totalCount"]
+        + repo["pullRequests"]["totalCount"],
+        "GitHub Contributors": rest_repo["contributors_count"],
+        "GitHub License Type": repo["licenseInfo"]["spdxId"]
+        if repo["licenseInfo"]
+        else None,
+        "GitHub Description": repo["description"],
+        "GitHub Topics": [
+            node["topic"]["name"] for node in repo["repositoryTopics"]["nodes"]
+        ],
+        # gather org name if it exists
+        "GitHub Organization": repo["owner"]["login"]
+        if repo["owner"]["__typename"] == "Organization"
+        else None,
+        "GitHub Network Count": rest_repo["network_count"],
+        "GitHub Detected Languages": {
+            edge["node"]["name"]: edge["size"] for edge in repo["languages"]["edges"]
+        },
+        "Date Created": parse_github_datetime(repo["createdAt"]),
+        "Date Most Recent Commit": parse_github_datetime(repo["pushedAt"]),
+        "Repository Size (KB)": repo["diskUsage"],
+        "GitHub Repo Archived": repo["isArchived"],
+    }
 
 
 # +
-df_projects = pd.DataFrame(
-    # create a list of repo data records for a dataframe
-    [
-        {
-            "Project Name": repo.name,
-            "GitHub Repository ID": repo.id,
-            "Project Homepage": repo.homepage,
-            "Project Repo URL": repo.html_url,
-            "Project Landscape Category": project.category,
-            "GitHub Stars": repo.stargazers_count,
-            "GitHub Forks": repo.forks_count,
-            "GitHub Subscribers": repo.subscribers_count,
-            "GitHub Open Issues": repo.get_issues(state="open").totalCount,
-            "GitHub Contributors": repo.get_contributors().totalCount,
-            "GitHub License Type": try_to_detect_license(repo),
-            "GitHub Description": repo.description,
-            "GitHub Topics": repo.topics,
-            # gather org name if it exists
-            "GitHub Organization": repo.organization.login
-            if repo.organization
-            else None,
-            "GitHub Network Count": repo.network_count,
-            "GitHub Detected Languages": repo.get_languages(),
-            "Date Created": repo.created_at.replace(tzinfo=pytz.UTC),
-            "Date Most Recent Commit": try_to_gather_most_recent_commit_date(repo),
-            # placeholders for later datetime calculations
-            "Duration Created to Most Recent Commit": "",
-            "Duration Created to Now": "",
-            "Duration Most Recent Commit to Now": "",
-            "Repository Size (KB)": repo.size,
-            "GitHub Repo Archived": repo.archived,
-        }
-        # make a request for github repo data with pygithub
-        for project, repo in [
-            (
-                project,
-                github_client.get_repo(
-                    project.repo_url.replace("https://github.com/", "")
-                ),
-            )
-            for project in projects
-        ]
-    ]
+# gather graphql repo data for all projects in batches
+repos = gather_github_repos(
+    [project.repo_url.replace("https://github.com/", "") for project in projects]
 )
 
+# show the repos which could not be found and are skipped below
+print(
+    "repos not found: ",
+    [full_name for full_name, repo in repos.items() if repo is None],
+)
+
+# gather the remaining repo data for each project in parallel
+# as the work is bound by network requests
+with ThreadPoolExecutor(max_workers=20) as executor:
+    df_projects = pd.DataFrame.from_records(
+        # create a list of repo data records for a dataframe
+        list(
+            executor.map(
+                gather_project_repo_data,
+                [
+                    project
+                    for project in projects
+                    # skip repos which could not be found
+                    if repos[project.repo_url.replace("https://github.com/", "")]
+                    is not None
+                ],
+            )
+        )
+    )
+
 # show the result
 df_projects
 
 # +
-# calculate time deltas
+# calculate time deltas through vectorized datetime column arithmetic
+# (added after the records to avoid placeholder object columns)
 df_projects["Duration Created to Most Recent Commit"] = (
     df_projects["Date Most Recent Commit"] - df_projects["Date Created"]
 )
-df_projects["Duration Created to Now"] = current_datetime - df_projects["Date Created"]
 df_projects["Duration Most Recent Commit to Now"] = (
     current_datetime - df_projects["Date Most Recent Commit"]
 )
 
-# create a years count for project time duration
+# create a years count for project time duration directly from the
+# creation date (the intermediate timedelta was not otherwise used)
 df_projects["Duration Created to Now in Years"] = (
-    df_projects["Duration Created to Now"].dt.days / 365
-)
+    current_datetime - df_projects["Date Created"]
+).dt.days.astype("float32") / 365
 
 # show the result
 df_projects
 # -
 
-# filter the results
-df_projects = df_projects[
-    # filter projects which are < 50 KB
-    df_projects["Repository Size (KB)"]
-    >= 50
-    # filter projects which have been archived
-    & ~df_projects["GitHub Repo Archived"]
-][  # filter projects which have no detected programming languages
-    df_projects["GitHub Detected Languages"].str.len()
-    > 0
-    # Drop duplicates based on github repository id
-].drop_duplicates(
-    subset="GitHub Repository ID"
-)
-df_projects.tail()
-
-# negate this duration value for sorting descendingly,
-# with projects that have been more recently changed sorting to the top
-df_projects["Negative Duration Most Recent Commit to Now"] = -df_projects[
-    "Duration Most Recent Commit to Now"
-]
-df_projects = df_projects.sort_values(
-    by=[
-        "GitHub Stars",
-        "GitHub Subscribers",
-        "GitHub Contributors",
-        "GitHub Forks",
-        "GitHub Open Issues",
-        "Negative Duration Most Recent Commit to Now",
-        "Duration Created to Most Recent Commit",
-    ],
-    ascending=False,
+# filter and sort the results through duckdb, using only the scalar columns
+# necessary for this along with the row positions of the projects
+df_projects_scalars = (
+    df_projects[
+        [
+            "GitHub Repository ID",
+            "Repository Size (KB)",
+            "GitHub Repo Archived",
+            "GitHub Stars",
+            "GitHub Subscribers",
+            "GitHub Contributors",
+            "GitHub Forks",
+            "GitHub Open Issues",
+            "Duration Most Recent Commit to Now",
+            "Duration Created to Most Recent Commit",
+        ]
+    ]
+    .assign(
+        **{
+            "GitHub Detected Languages Count": df_projects[
+                "GitHub Detected Languages"
+            ].str.len(),
+            "Row Position": range(len(df_projects)),
+        }
+    )
+    .reset_index(drop=True)
 )
+with duckdb.connect() as ddb:
+    df_projects = df_projects.iloc[
+        ddb.query(
+            """
+        SELECT "Row Position"
+        FROM df_projects_scalars
+        WHERE
+            /* filter projects which are < 50 KB */
+            "Repository Size (KB)" >= 50
+            /* filter projects which have been archived */
+            AND NOT "GitHub Repo Archived"
+            /* filter projects which have no detected programming languages */
+            AND "GitHub Detected Languages Count" > 0
+        /* drop duplicates based on github repository id */
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY "GitHub Repository ID" ORDER BY "Row Position"
+        ) = 1
+        /* sort with projects that have been more recently changed sorting to the top */
+        ORDER BY
+            "GitHub Stars" DESC,
+            "GitHub Subscribers" DESC,
+            "GitHub Contributors" DESC,
+            "GitHub Forks" DESC,
+            "GitHub Open Issues" DESC,
+            "Duration Most Recent Commit to Now" ASC NULLS LAST,
+            "Duration Created to Most Recent Commit" DESC NULLS LAST,
+            "Row Position"
+        """
+        )
+        .df()["Row Position"]
+        .tolist()
+    ]
 df_projects
 
 # export to parquet for later use
@@ -21,102 +21,275 @@
 # Set an environment variable named `LANDSCAPE_ANALYSIS_GH_TOKEN` to a [GitHub access token](https://docs.github.com/en/authentication/keeping-your-account-and-data-secure/managing-your-personal-access-tokens). E.g.: `export LANDSCAPE_ANALYSIS_GH_TOKEN=token_here`
 
 # +
+import asyncio
 import os
-from datetime import datetime
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Tuple
 
-import numpy as np
+import aiohttp
+import nest_asyncio
 import pandas as pd
+import yaml
 from box import Box
-from github import Auth, Github
-
-# set github authorization and client
-github_client = Github(
-    auth=Auth.Token(os.environ.get("LANDSCAPE_ANALYSIS_GH_TOKEN")), per_page=100
-)
 
 # +
+# use the libyaml c extension for parsing and emitting yaml where available
+# (python-box otherwise relies on pyyaml's pure-python loader and dumper)
+yaml_loader = yaml.CSafeLoader if yaml.__with_libyaml__ else yaml.SafeLoader
+yaml_dumper = yaml.CSafeDumper if yaml.__with_libyaml__ else yaml.SafeDumper
+
 # gather projects data
-queries = Box.from_yaml(filename="data/queries.yaml").queries
+with open("data/queries.yaml", "r") as queries_file:
+    queries = Box(yaml.load(queries_file, Loader=yaml_loader)).queries
 
 # observe the queries
 queries.to_list()
 # -
 
+# parse target projects once for reuse when filtering and exporting results
+with open("data/target-projects.yaml", "r") as target_projects_file:
+    target_projects = yaml.load(target_projects_file, Loader=yaml_loader)["projects"]
+
 # setup a reference for target project urls to ignore as additions to avoid duplication
-target_project_html_urls = [
-    project["repo_url"]
-    for project in Box.from_yaml(filename="data/target-projects.yaml").projects
-]
+target_project_html_urls = [project["repo_url"] for project in target_projects]
 target_project_html_urls
 
+
+# +
+# gather repo search results through concurrent requests to the GitHub API
+# (pygithub otherwise paginates through these results one page at a time)
+async def fetch_search_page(
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    query: str,
+    page: int,
+    max_backoff_attempts: int = 6,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Fetches a page of repository search results for a query,
+    waiting for the search rate limits to reset where necessary.
+    """
+
+    async with semaphore:
+        backoff_attempts = 0
+        while True:
+            async with session.get(
+                "https://api.github.com/search/repositories",
+                params={
+                    "q": query,
+                    "sort": "stars",
+                    "order": "desc",
+                    "page": page,
+                    "per_page": 100,
+                },
+            ) as response:
+                if response.status in (403, 429):
+                    # wait as long as github asks where a secondary rate limit is hit
+                    if "Retry-After" in response.headers:
+                        await asyncio.sleep(int(response.headers["Retry-After"]))
+                        continue
+                    # wait for the search rate limit to reset when it is exceeded
+                    if response.headers.get("X-RateLimit-Remaining") == "0":
+                        await asyncio.sleep(
+                            max(
+                                int(response.headers["X-RateLimit-Reset"])
+                                - time.time(),
+                                0,
+                            )
+                            + 1
+                        )
+                        continue
+                    # otherwise back off exponentially, as secondary rate limits
+                    # may not specify how long to wait
+                    if backoff_attempts < max_backoff_attempts:
+                        backoff_attempts += 1
+                        await asyncio.sleep(2**backoff_attempts)
+                        continue
+                response.raise_for_status()
+                return await response.json(), response.links
+
+
+async def fetch_search_results(
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    query: str,
+    created_start: date,
+    created_end: date,
+) -> List[Dict[str, Any]]:
+    """
+    Fetches repository search results for a query within a window
+    of repository creation dates by requesting all pages of results
+    at once, splitting the window where there are more results than
+    GitHub search provides.
+    """
+
+    windowed_query = (
+        f"{query} created:{created_start.isoformat()}..{created_end.isoformat()}"
+    )
+
+    # use the first page to find how many results and pages there are
+    first_page, links = await fetch_search_page(session, semaphore, windowed_query, 1)
+
+    # github search only provides up to the first 1000 results, so split the
+    # window in half and search each half where there are more results
+    if first_page["total_count"] > 1000 and created_start < created_end:
+        created_midpoint = created_start + (created_end - created_start) / 2
+        window_results = await asyncio.gather(
+            fetch_search_results(
+                session, semaphore, query, created_start, created_midpoint
+            ),
+            fetch_search_results(
+                session,
+                semaphore,
+                query,
+                created_midpoint + timedelta(days=1),
+                created_end,
+            ),
+        )
+        return [result for results in window_results for result in results]
+
+    last_page = int(links["last"]["url"].query["page"]) if "last" in links else 1
+    other_pages = await asyncio.gather(
+        *[
+            fetch_search_page(session, semaphore, windowed_query, page)
+            for page in range(2, last_page + 1)
+        ]
+    )
+
+    return [
+        result
+        for page in [first_page] + [page for page, _ in other_pages]
+        for result in page["items"]
+    ]
+
+
+async def gather_search_results(queries: List[str]) -> List[List[Dict[str, Any]]]:
+    """
+    Gathers repository search results for many queries concurrently,
+    sorted by stars for each query.
+    """
+
+    # limit concurrent requests to help respect GitHub search rate limits
+    # (search requests count heavily towards secondary rate limits)
+    semaphore = asyncio.Semaphore(3)
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=3),
+        headers={
+            "Authorization": f"Bearer {os.environ.get('LANDSCAPE_ANALYSIS_GH_TOKEN')}"
+        },
+    ) as session:
+        results = await asyncio.gather(
+            *[
+                # search across all creation dates from github's founding until now
+                fetch_search_results(
+                    session, semaphore, query, date(2008, 1, 1), date.today()
+                )
+                for query in queries
+            ]
+        )
+
+    # sort the results from each date window together by stars
+    return [
+        sorted(
+            query_results,
+            key=lambda result: result["stargazers_count"],
+            reverse=True,
+        )
+        for query_results in results
+    ]
+
+
+async def gather_landscape_sources(
+    queries: List[str],
+) -> Tuple[List[List[Dict[str, Any]]], pd.DataFrame]:
+    """
+    Gathers repository search results while reading scRNA-Tools data
+    in a separate thread, as neither depends on the other.
+    """
+
+    search_results, df_scrna_tools = await asyncio.gather(
+        gather_search_results(queries),
+        asyncio.to_thread(pd.read_csv, "data/scRNA-Tools-tableExport-2023-10-12.csv"),
+    )
+
+    return search_results, df_scrna_tools
+
+
+# allow for nested asyncio ops
+nest_asyncio.apply()
+
+search_results, df_scrna_tools = asyncio.get_event_loop().run_until_complete(
+    gather_landscape_sources(queries.to_list())
+)
+
 # gather repo data from GitHub based on the results of search queries
 results = [
     {
-        "name": result.name,
-        "homepage_url": result.homepage,
-        "repo_url": result.html_url,
+        "name": result["name"],
+        "homepage_url": result["homepage"],
+        "repo_url": result["html_url"],
         "category": ["related-tools-github-query-result"],
     }
-    for query in queries
-    for result in github_client.search_repositories(
-        query=query, sort="stars", order="desc"
-    )
-    if result.html_url not in target_project_html_urls
+    for query_results in search_results
+    for result in query_results
+    if result["html_url"] not in target_project_html_urls
 ]
 len(results)
+# -
 
 # +
-# read and display rough content of scRNA-Tools content
-df_scrna_tools = pd.read_csv("data/scRNA-Tools-tableExport-2023-10-12.csv")
+# display rough content of scRNA-Tools content (read alongside the searches above)
 print(df_scrna_tools.shape)
 
 # replace none-like values for citations with 0's for the purpose of sorting
 df_scrna_tools["Citations"] = (
-    df_scrna_tools["Citations"].replace("-", "0").replace("'-", "0")
-).astype("int64")
+    pd.to_numeric(df_scrna_tools["Citations"], errors="coerce")
+    .fillna(0)
+    .astype("int32")
+)
 
-# drop rows where we don't have a repository
-df_scrna_tools = df_scrna_tools.dropna(subset=["Code"])
+# filter results to only those with a github link in a single boolean mask
+# (which also excludes rows without a repository) and select the top 100
+# by number of citations without sorting all rows
+df_scrna_tools = df_scrna_tools[
+    df_scrna_tools["Code"].str.startswith("https://github.com", na=False)
+].nlargest(100, "Citations")
 
 df_scrna_tools["name"] = df_scrna_tools["Name"]
 df_scrna_tools["repo_url"] = df_scrna_tools["Code"]
 
-df_scrna_tools["category"] = np.tile(
-    ["cytomining-ecosystem-adjacent-tools"], (len(df_scrna_tools), 1)
-).tolist()
-
-# filter results to only those with a github link and sort values by number of citations
-df_scrna_tools = df_scrna_tools[
-    df_scrna_tools["Code"].str.contains("https://github.com")
-].sort_values(by=["Citations"], ascending=False)
+# note: each row receives its own list to avoid yaml aliases for shared objects on export
+df_scrna_tools["category"] = [
+    ["cytomining-ecosystem-adjacent-tools"] for _ in range(len(df_scrna_tools))
+]
 
 # show a previow of the results
 df_scrna_tools.head(5)[["name", "repo_url", "category"]]
 # -
 
 # convert top 100 results to projects-like dataset
-df_scrna_tools_records = df_scrna_tools.head(100)[
-    ["name", "repo_url", "category"]
-].to_dict(orient="records")
-df_scrna_tools_records[:5]
+df_scrna_tools_results = df_scrna_tools[["name", "repo_url", "category"]]
+df_scrna_tools_results.head(5)
 
-# append results from both datasets together
-results = df_scrna_tools_records + results
+# append results from both datasets together and filter them to uniques
+# by repo url, keeping the first result for each url
+df_results = pd.concat(
+    [df_scrna_tools_results, pd.DataFrame.from_records(results)], ignore_index=True
+).drop_duplicates(subset="repo_url", keep="first")
+len(df_results)
 
-# filter the list of results to uniques
-seen_url = set()
-results = [
-    result
-    for result in results
-    # check whether we have seen the result yet
-    if result["repo_url"] not in seen_url
-    # always returns None, so evals to True and adds to list
-    and not seen_url.add(result["repo_url"])
-]
-len(results)
-
-# append target projects to the results
-results = Box.from_yaml(filename="data/target-projects.yaml").projects + results
+# append target projects to the results, using none for missing homepage urls
+results = target_projects + (
+    df_results.astype(object).where(df_results.notna(), None).to_dict(orient="records")
+)
 
 # export the results to a yaml file for later processing
-Box({"projects": results}).to_yaml("data/projects.yaml")
+with open("data/projects.yaml", "w") as projects_file:
+    yaml.dump(
+        {"projects": results},
+        projects_file,
+        Dumper=yaml_dumper,
+        default_flow_style=False,
+        allow_unicode=True,
+    )
@@ -24,11 +24,9 @@
 
 # +
 import asyncio
-import itertools
+import collections
 import os
 import pathlib
-import random
-from datetime import datetime
 
 import nest_asyncio
 import numpy as np
@@ -37,21 +35,20 @@ import plotly.colors as pc
 import plotly.express as px
 import plotly.graph_objects as go
 import plotly.io as pio
-import pytz
+import pyarrow.parquet as pq
 from box import Box
 from itables import to_html_datatable
 from pandas.api.types import CategoricalDtype
-from plotly.offline import plot
+from plotly.offline import get_plotlyjs_version, plot
 from plotly.subplots import make_subplots
 from pyppeteer import launch
 from ydata_profiling import ProfileReport
 
-# set plotly default theme
-pio.templates.default = "simple_white"
-
-# get the current datetime
-tz = pytz.timezone("UTC")
-current_datetime = datetime.now(tz)
+# set plotly default theme, including a common figure size for this report
+pio.templates["landscape"] = go.layout.Template(
+    layout=go.Layout(width=1200, height=500)
+)
+pio.templates.default = "simple_white+landscape"
 
 # set common str's
 title_prefix = "Cytomining Ecosystem Software Landscape Analysis"
@@ -72,6 +69,9 @@ custom_order = [
 ]
 report_category_dtype = CategoricalDtype(categories=custom_order, ordered=True)
 
+# map each category to a color once so that categories share colors across figures
+category_color_map = dict(zip(custom_order, category_color_sequence))
+
 # set section descriptions
 section_descriptions = {
     "User base": """
@@ -91,40 +91,151 @@ section_descriptions = {
 }
 # -
 
-# read in project metric data
-df_projects = pd.read_parquet("data/project-github-metrics.parquet")
-df_projects = df_projects.reset_index(drop=True)
-df_projects.info()
-
 # +
-# set a category column to the first category from a potential list of categories
-df_projects["category"] = df_projects["Project Landscape Category"].str[0]
-# remove prefix from certain categories for brevity
-df_projects["category"] = (
-    df_projects["category"]
-    .str.replace("cytomining-ecosystem-", "")
-    .str.replace("related-tools-", "")
+# prepared project data is cached on disk, keyed by the modification time and size of
+# the project metric data and a version which should be incremented when the preparation
+# within load_projects changes (remove this directory to force preparing the data again)
+projects_cache_version = 3
+projects_stat = os.stat("data/project-github-metrics.parquet")
+projects_cache_path = (
+    pathlib.Path.home()
+    / ".cache"
+    / "landscape-analysis"
+    / "visualize-landscape"
+    / (
+        f"projects-{projects_stat.st_mtime_ns}-{projects_stat.st_size}"
+        f"-v{projects_cache_version}.feather"
+    )
 )
-df_projects["category"] = df_projects["category"].astype(report_category_dtype)
 
-df_projects.head(5)
+
+def load_projects() -> pd.DataFrame:
+    """
+    Reads and prepares project metric data for visualization,
+    reusing data prepared by an earlier run where the source is unchanged.
+    """
+
+    if projects_cache_path.exists():
+        return pd.read_feather(projects_cache_path).set_index("index").rename_axis(None)
+
+    # read in project metric data, limited to the columns used within this notebook
+    # (memory mapped with threaded, pre-buffered column reads, releasing arrow
+    # buffers while converting to pandas)
+    df_projects = pq.read_table(
+        "data/project-github-metrics.parquet",
+        columns=[
+            "Project Name",
+            "Project Repo URL",
+            "Project Landscape Category",
+            "GitHub Stars",
+            "GitHub Forks",
+            "GitHub Subscribers",
+            "GitHub Open Issues",
+            "GitHub Contributors",
+            "GitHub Organization",
+            "GitHub Detected Languages",
+            "Date Created",
+            "Date Most Recent Commit",
+            "Duration Created to Now in Years",
+        ],
+        use_threads=True,
+        pre_buffer=True,
+        memory_map=True,
+    ).to_pandas(split_blocks=True, self_destruct=True)
+    df_projects = df_projects.reset_index(drop=True)
+
+    # downcast github count columns to the smallest integer types which fit their values
+    for count_column in [
+        "GitHub Stars",
+        "GitHub Forks",
+        "GitHub Subscribers",
+        "GitHub Open Issues",
+        "GitHub Contributors",
+    ]:
+        df_projects[count_column] = pd.to_numeric(
+            df_projects[count_column], downcast="integer"
+        )
+
+    # set a category column to the first category from a potential list of categories
+    df_projects["category"] = df_projects["Project Landscape Category"].str[0]
+    # remove prefix from certain categories for brevity
+    df_projects["category"] = (
+        df_projects["category"]
+        .str.replace("cytomining-ecosystem-", "")
+        .str.replace("related-tools-", "")
+    )
+    df_projects["category"] = df_projects["category"].astype(report_category_dtype)
+
+    # sort projects by category once so that figures may use them in this order
+    # (a stable sort preserves the existing order of projects within categories)
+    df_projects = df_projects.sort_values(by="category", kind="mergesort")
+
+    # expand the detected languages into a dataframe with a column for each language
+    # and a row for each project for vectorized calculations below
+    # (languages which aren't detected for a project are null)
+    df_languages = pd.DataFrame.from_records(
+        [
+            languages if isinstance(languages, dict) else {}
+            for languages in df_projects["GitHub Detected Languages"]
+        ],
+        index=df_projects.index,
+    )
+
+    # gather the number of lines of code
+    # (summing across languages and leaving projects without language data as null)
+    df_projects["total lines of GitHub detected code"] = df_languages.sum(axis=1).where(
+        df_projects["GitHub Detected Languages"].notna()
+    )
+
+    # find the top language for each project as the language with the most
+    # lines of code (projects without detected languages have no top language),
+    # stored as a categorical as few languages repeat across many projects
+    df_projects["Primary language"] = (
+        df_languages.dropna(how="all")
+        .idxmax(axis=1)
+        .reindex(df_projects.index)
+        .astype("category")
+    )
+
+    # drop the nested list and dict columns which the derived columns replace
+    # so they aren't carried through figures, tables, and the cache
+    df_projects = df_projects.drop(
+        columns=["Project Landscape Category", "GitHub Detected Languages"]
+    )
+
+    projects_cache_path.parent.mkdir(parents=True, exist_ok=True)
+    df_projects.reset_index().to_feather(projects_cache_path)
+
+    return df_projects
+
+
+df_projects = load_projects()
+df_projects.info()
 # -
 
+df_projects.head(5)
+
 # create list to collect the figures for later display together
 fig_collection = []
 
+
+def add_log_column(df: pd.DataFrame, column: str) -> None:
+    """
+    Adds a log scale copy of a column to a dataframe to help visualize,
+    moving 0's to null to avoid divide by 0.
+    """
+
+    # note: float32 is precise enough for plotting log values
+    df[f"{column} (Log Scale)"] = np.log(df[column].where(df[column] > 0)).astype(
+        "float32"
+    )
+
+
 # +
 # Github stars and time scatter
 
 # add log of github stars to help visualize
-df_projects["GitHub Stars (Log Scale)"] = np.log(
-    df_projects["GitHub Stars"].apply(
-        # move 0's to None to avoid divide by 0
-        lambda x: x
-        if x > 0
-        else None
-    )
-)
+add_log_column(df_projects, "GitHub Stars")
 
 fig_usage_stars = px.scatter(
     df_projects[df_projects["category"] != "loi-focus"],
@@ -132,9 +243,7 @@ fig_usage_stars = px.scatter(
     x="Duration Created to Now in Years",
     y="GitHub Stars (Log Scale)",
     color="category",
-    width=1200,
-    height=500,
-    color_discrete_sequence=category_color_sequence,
+    color_discrete_map=category_color_map,
     symbol="category",
     symbol_sequence=["circle", "circle", "circle", "circle"],
     render_mode="webgl",
@@ -147,10 +256,8 @@ fig_usage_stars.add_traces(
         hover_name="Project Name",
         x="Duration Created to Now in Years",
         y="GitHub Stars (Log Scale)",
-        width=1200,
-        height=500,
         color="category",
-        color_discrete_sequence=[category_color_sequence[4]],
+        color_discrete_map=category_color_map,
         symbol_sequence=["star-diamond"],
         render_mode="webgl",
     )
@@ -203,18 +310,20 @@ fig_usage_stars.show()
 
 # +
 # Create an icicle chart using Plotly Express
-df_treemap = df_projects.copy()
-df_treemap["GitHub Stars"] = np.where(
-    df_treemap["GitHub Stars"] == 0, np.nan, df_treemap["GitHub Stars"]
-)
+# (using only the needed columns with 0 stars moved to null to leave them out)
 fig_usage_stars_treemap = px.treemap(
-    df_treemap.sort_values(by="category"),
+    df_projects[["category", "Project Name"]].assign(
+        **{
+            "GitHub Stars": df_projects["GitHub Stars"].mask(
+                df_projects["GitHub Stars"] == 0
+            )
+        }
+    ),
     title="GitHub Stars Project Tree Map (click to zoom)",
     path=["category", "Project Name"],
     values="GitHub Stars",
     color="GitHub Stars",
     color_continuous_scale="Viridis",
-    width=1200,
     height=700,
 )
 
@@ -241,32 +350,16 @@ fig_usage_stars_treemap.show()
 # +
 # scatter plot for maturity based on project
 
-# gather the number of lines of code
-df_projects["total lines of GitHub detected code"] = (
-    df_projects["GitHub Detected Languages"]
-    .dropna()
-    .apply(lambda x: sum(value if value is not None else 0 for value in x.values()))
-)
-
-# add log of github stars to help visualize
-df_projects["total lines of GitHub detected code (Log Scale)"] = np.log(
-    df_projects["total lines of GitHub detected code"].apply(
-        # move 0's to None to avoid divide by 0
-        lambda x: x
-        if x > 0
-        else None
-    )
-)
+# add log of lines of code to help visualize
+add_log_column(df_projects, "total lines of GitHub detected code")
 
 fig_maturity_loc_and_age = px.scatter(
-    df_projects[df_projects["category"] != "loi-focus"].sort_values(by="category"),
+    df_projects[df_projects["category"] != "loi-focus"],
     hover_name="Project Name",
     x="Duration Created to Now in Years",
     y="total lines of GitHub detected code (Log Scale)",
-    width=1200,
-    height=500,
     color="category",
-    color_discrete_sequence=category_color_sequence,
+    color_discrete_map=category_color_map,
     symbol="category",
     symbol_sequence=["circle", "circle", "circle", "circle"],
     render_mode="webgl",
@@ -279,10 +372,8 @@ fig_maturity_loc_and_age.add_traces(
         hover_name="Project Name",
         x="Duration Created to Now in Years",
         y="total lines of GitHub detected code (Log Scale)",
-        width=1200,
-        height=500,
         color="category",
-        color_discrete_sequence=[category_color_sequence[4]],
+        color_discrete_map=category_color_map,
         symbol_sequence=["star-diamond"],
         render_mode="webgl",
     )
@@ -335,14 +426,12 @@ fig_maturity_loc_and_age.show()
 """
 
 fig_maturity_latest_commit = px.scatter(
-    df_projects[df_projects["category"] != "loi-focus"].sort_values(by="category"),
+    df_projects[df_projects["category"] != "loi-focus"],
     hover_name="Project Name",
     x="Date Most Recent Commit",
     y="GitHub Stars (Log Scale)",
-    width=1200,
-    height=500,
     color="category",
-    color_discrete_sequence=category_color_sequence,
+    color_discrete_map=category_color_map,
     symbol="category",
     symbol_sequence=["circle", "circle", "circle", "circle"],
     render_mode="webgl",
@@ -355,10 +444,8 @@ fig_maturity_latest_commit.add_traces(
         hover_name="Project Name",
         x="Date Most Recent Commit",
         y="GitHub Stars (Log Scale)",
-        width=1200,
-        height=500,
         color="category",
-        color_discrete_sequence=[category_color_sequence[4]],
+        color_discrete_map=category_color_map,
         symbol_sequence=["star-diamond"],
         render_mode="webgl",
     )
@@ -400,26 +487,17 @@ fig_maturity_latest_commit.show()
 # +
 # scatter plot for network and subscribers
 
-# add log of github stars to help visualize
-df_projects["GitHub Forks (Log Scale)"] = np.log(
-    df_projects["GitHub Forks"].apply(
-        # move 0's to None to avoid divide by 0
-        lambda x: x
-        if x > 0
-        else None
-    )
-)
+# add log of github forks to help visualize
+add_log_column(df_projects, "GitHub Forks")
 
 
 fig_network_and_subscribers = px.scatter(
-    df_projects[df_projects["category"] != "loi-focus"].sort_values(by="category"),
+    df_projects[df_projects["category"] != "loi-focus"],
     hover_name="Project Name",
     x="GitHub Forks (Log Scale)",
     y="GitHub Subscribers",
-    width=1200,
-    height=500,
     color="category",
-    color_discrete_sequence=category_color_sequence,
+    color_discrete_map=category_color_map,
     symbol="category",
     symbol_sequence=["circle", "circle", "circle", "circle"],
     render_mode="webgl",
@@ -432,10 +510,8 @@ fig_network_and_subscribers.add_traces(
         hover_name="Project Name",
         x="GitHub Forks (Log Scale)",
         y="GitHub Subscribers",
-        width=1200,
-        height=500,
         color="category",
-        color_discrete_sequence=[category_color_sequence[4]],
+        color_discrete_map=category_color_map,
         symbol_sequence=["star-diamond"],
         render_mode="webgl",
     )
@@ -476,26 +552,17 @@ fig_network_and_subscribers.show()
 # +
 # scatter plot for contributors and issues
 
-# add log of github stars to help visualize
-df_projects["GitHub Open Issues (Log Scale)"] = np.log(
-    df_projects["GitHub Open Issues"].apply(
-        # move 0's to None to avoid divide by 0
-        lambda x: x
-        if x > 0
-        else None
-    )
-)
+# add log of github open issues to help visualize
+add_log_column(df_projects, "GitHub Open Issues")
 
 
 fig_contributors_and_issues = px.scatter(
-    df_projects[df_projects["category"] != "loi-focus"].sort_values(by="category"),
+    df_projects[df_projects["category"] != "loi-focus"],
     hover_name="Project Name",
     x="GitHub Open Issues (Log Scale)",
     y="GitHub Contributors",
-    width=1200,
-    height=500,
     color="category",
-    color_discrete_sequence=category_color_sequence,
+    color_discrete_map=category_color_map,
     symbol="category",
     symbol_sequence=["circle", "circle", "circle", "circle"],
     render_mode="webgl",
@@ -508,10 +575,8 @@ fig_contributors_and_issues.add_traces(
         hover_name="Project Name",
         x="GitHub Open Issues (Log Scale)",
         y="GitHub Contributors",
-        width=1200,
-        height=500,
         color="category",
-        color_discrete_sequence=[category_color_sequence[4]],
+        color_discrete_map=category_color_map,
         symbol_sequence=["star-diamond"],
         render_mode="webgl",
     )
@@ -550,56 +615,36 @@ fig_contributors_and_issues.show()
 
 
 # +
-# Function to find the top language for each row
-def find_top_language(languages):
-    if isinstance(languages, dict):
-        non_empty_languages = {
-            key: value for key, value in languages.items() if value is not None
-        }
-        if non_empty_languages:
-            return max(non_empty_languages, key=non_empty_languages.get)
-    return None
-
-
-# Apply the function to the "GitHub Detected Languages" column and create a new column "Primary programming language"
-df_projects["Primary language"] = df_projects["GitHub Detected Languages"].apply(
-    find_top_language
-)
+# show the top language for each project
 df_projects[["Project Name", "Primary language"]]
 
 # +
 # Create a hbar chart for primary languages
-grouped_data = (
-    df_projects.groupby(["Primary language", "category"])
-    .size()
-    .reset_index(name="Count")
+# count projects by primary language and category in a single pass
+df_language_counts = pd.crosstab(
+    df_projects["Primary language"], df_projects["category"]
 )
 
-# Group by "Primary programming language" and calculate the sum of counts for each programming language
-programming_language_counts = (
-    grouped_data.groupby("Primary language")["Count"].sum().reset_index()
-)
+# gather the counts in long form for plotting, leaving out empty combinations
+grouped_data = df_language_counts.stack().rename("Count").reset_index()
+grouped_data = grouped_data[grouped_data["Count"] > 0]
 
 # Sort programming languages by the sum of counts in descending order
-programming_language_counts = programming_language_counts.sort_values(
-    by="Count", ascending=False
+programming_language_order = (
+    df_language_counts.sum(axis=1).sort_values(ascending=False).index.tolist()
 )
 
-
 # Create a horizontal bar chart
 fig_languages = px.bar(
     grouped_data.sort_values(by="category"),
     y="Primary language",
     x="Count",
     color="category",
-    color_discrete_sequence=category_color_sequence,
+    color_discrete_map=category_color_map,
     text="Count",
     orientation="h",
     # Sort bars by programming language counts
-    category_orders={
-        "Primary language": programming_language_counts["Primary language"].tolist()
-    },
-    width=1200,
+    category_orders={"Primary language": programming_language_order},
     height=700,
 )
 
@@ -613,8 +658,8 @@ fig_languages.update_layout(
     # ensure all y axis labels appear
     yaxis=dict(
         tickmode="array",
-        tickvals=programming_language_counts["Primary language"].tolist(),
-        ticktext=programming_language_counts["Primary language"].tolist(),
+        tickvals=programming_language_order,
+        ticktext=programming_language_order,
     ),
 )
 
@@ -638,13 +683,14 @@ fig_languages.show()
 
 # +
 # gather project org data
-df_project_orgs = df_projects["GitHub Organization"].value_counts()
+# count projects by organization in ascending order, filtered to orgs with more than one project
+df_project_orgs = df_projects["GitHub Organization"].value_counts(ascending=True)
+df_project_orgs = df_project_orgs[df_project_orgs > 1]
 
 # Create a horizontal bar chart using Plotly Express
 fig_orgs = px.bar(
-    df_project_orgs[df_project_orgs > 1].sort_values(ascending=True),
+    df_project_orgs,
     orientation="h",
-    width=1200,
     height=1000,
 )
 
@@ -685,12 +731,15 @@ df_project_orgs_stars = (
     .groupby(by=["GitHub Organization"])["GitHub Stars"]
     .sum()
 )
+# filter to orgs with more than 100 stars before sorting
+df_project_orgs_stars = df_project_orgs_stars[df_project_orgs_stars > 100].sort_values(
+    ascending=True
+)
 
 # Create a horizontal bar chart using Plotly Express
 fig_orgs_stars = px.bar(
-    df_project_orgs_stars[df_project_orgs_stars > 100].sort_values(ascending=True),
+    df_project_orgs_stars,
     orientation="h",
-    width=1200,
     height=1000,
 )
 
@@ -723,30 +772,65 @@ fig_collection.append(
 fig_orgs_stars.show()
 # -
 
-# create a ydata_profiling profile
-profile = ProfileReport(df_projects, title=f"{title_prefix}: Data Profile")
-profile.to_notebook_iframe()
+# create a ydata_profiling profile, reusing the exported profile
+# where it is newer than the project metric data it describes
+# (set LANDSCAPE_ANALYSIS_REGENERATE_PROFILE=1 to always create a new profile)
+data_profile_path = f"{export_dir}/data_profile.html"
+if (
+    os.environ.get("LANDSCAPE_ANALYSIS_REGENERATE_PROFILE") != "1"
+    and os.path.exists(data_profile_path)
+    and os.path.getmtime(data_profile_path)
+    > os.path.getmtime("data/project-github-metrics.parquet")
+):
+    print(f"Using existing data profile: {data_profile_path}")
+else:
+    # limit correlations to pearson and skip pairwise interaction plots,
+    # which otherwise grow with the square of the number of columns
+    profile = ProfileReport(
+        df_projects,
+        title=f"{title_prefix}: Data Profile",
+        correlations={"auto": {"calculate": False}, "pearson": {"calculate": True}},
+        interactions={"continuous": False},
+    )
+    profile.to_notebook_iframe()
 
-profile.to_file(f"{export_dir}/data_profile.html")
+    profile.to_file(data_profile_path)
 
 # organize figures by their sections and the order in which they appeared in this notebook
-fig_collection_grouped = {
-    key: [
+# (sections need not be contiguous within the figure collection)
+fig_collection_grouped = collections.defaultdict(list)
+for entry in fig_collection:
+    fig_collection_grouped[entry["section"]].append(
         {
             "plot": entry["plot"],
             "description": entry["description"],
             "findings": entry["findings"],
         }
-        for entry in group
-    ]
-    for key, group in itertools.groupby(fig_collection, key=lambda x: x["section"])
-}
+    )
 fig_collection_grouped.keys()
 
-cdn_included = False
-with open(f"{export_dir}/report.html", "w") as f:
-    f.write(
-        """
+
+def plotly_figure_to_html(figure: go.Figure, div_id: str) -> str:
+    """
+    Renders a plotly figure as an empty div and a script which draws
+    the figure json using plotly.js as loaded once within the page head.
+    """
+
+    # skip validation as figures were validated when they were built, and
+    # escape closing tags within the json to avoid ending the script early
+    figure_json = pio.to_json(figure, validate=False).replace("</", "<\\/")
+    return f"""
+    <div id="{div_id}" class="plotly-graph-div" style="height:100%; width:100%;"></div>
+    <script type="text/javascript">
+        Plotly.newPlot("{div_id}", Object.assign({figure_json}, {{"config": {{"responsive": true}}}}));
+    </script>
+    """
+
+
+# gather the report html in parts to write them to file all at once
+report_parts = []
+report_parts.append(
+    f"""
 <html>
 <!-- referenced with modifications from example work on: https://github.com/KrauseFx/markdown-to-html-github-style -->
 
@@ -755,6 +839,7 @@ with open(f"{export_dir}/report.html", "w") as f:
     <meta name="viewport" content="width=device-width, initial-scale=1">
     <meta charset="UTF-8">
     <link rel="stylesheet" href="../css/style.css">
+    <script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>
 </head>
 
 <body>
@@ -768,60 +853,64 @@ with open(f"{export_dir}/report.html", "w") as f:
                 href="https://github.com/WayScience/software-landscape-analysis">https://github.com/WayScience/software-landscape-analysis</a>.
         </p>
     """
-    )
+)
 
-    for section, figures in fig_collection_grouped.items():
-        f.write(f"<h2>{section}</h2>")
-        f.write(f"<p>{section_descriptions[section]}</p>")
-        f.write(f"<br><br>")
-        for figure in figures:
-            f.write(
-                figure["plot"].to_html(
-                    full_html=False,
-                    include_plotlyjs="cdn" if not cdn_included else False,
-                )
+for section, figures in fig_collection_grouped.items():
+    report_parts.append(f"<h2>{section}</h2>")
+    report_parts.append(f"<p>{section_descriptions[section]}</p>")
+    report_parts.append(f"<br><br>")
+    for figure in figures:
+        report_parts.append(
+            plotly_figure_to_html(
+                figure=figure["plot"], div_id=f"plot-{len(report_parts)}"
             )
-            f.write(
-                f"""
+        )
+        report_parts.append(
+            f"""
             <ul>
             <li><strong>Description:</strong> {figure['description']}</li>
             <li><strong>Findings:</strong> {figure['findings']}</li>
             </ul>
             """
-            )
-            cdn_included = True
+        )
 
-    f.write(
-        """
+report_parts.append(
+    """
     <h2>Table with selected dataset columns</h2>
     <p>The table below may be used to search and view a selected number of columns from the dataset.</p>
     """
-    )
+)
 
-    # write an itable to the page
-    f.write(
-        to_html_datatable(
-            df_projects[
-                [
-                    "Project Name",
-                    "Project Repo URL",
-                    "GitHub Stars",
-                    "GitHub Forks",
-                    "GitHub Subscribers",
-                    "GitHub Open Issues",
-                    "GitHub Contributors",
-                    "Date Created",
-                    "category",
-                    "Primary language",
-                ]
-            ],
-            style="height:600px;float:left;",
-            classes="display",
-            maxBytes=0,
-            # fix a malformed attributes error built into the html content
-        ).replace('class="display"style="', 'class="display" style="')
-    )
-    f.write("</div></body></html>")
+# write an itable to the page
+report_parts.append(
+    to_html_datatable(
+        df_projects[
+            [
+                "Project Name",
+                "Project Repo URL",
+                "GitHub Stars",
+                "GitHub Forks",
+                "GitHub Subscribers",
+                "GitHub Open Issues",
+                "GitHub Contributors",
+                "Date Created",
+                "category",
+                "Primary language",
+            ]
+        ].assign(
+            # show creation dates without their time to shorten the embedded table data
+            **{"Date Created": df_projects["Date Created"].dt.strftime("%Y-%m-%d")}
+        ),
+        style="height:600px;float:left;",
+        classes="display",
+        maxBytes=0,
+        # fix a malformed attributes error built into the html content
+    ).replace('class="display"style="', 'class="display" style="')
+)
+report_parts.append("</div></body></html>")
+
+with open(f"{export_dir}/report.html", "w") as f:
+    f.writelines(report_parts)
 
 # +
 # capture the html page as a png export as a backup
@@ -834,13 +923,16 @@ nest_asyncio.apply()
 # see: https://github.com/pyppeteer/pyppeteer#examples
 async def capture_screenshot(file_path, output_path):
     browser = await launch(headless=True)
-    page = await browser.newPage()
-    # set the size of the capture
-    await page.setViewport({"width": 1400, "height": 8700})
-    await page.goto(f"file://{file_path}")
-
-    await page.screenshot({"path": output_path})
-    await browser.close()
+    try:
+        page = await browser.newPage()
+        # set the size of the capture
+        await page.setViewport({"width": 1400, "height": 8700})
+        # wait for plotly.js and other page resources to finish loading
+        await page.goto(f"file://{file_path}", waitUntil="networkidle0")
+        await page.screenshot({"path": output_path})
+    finally:
+        # close the browser process even where the capture fails
+        await browser.close()
 
 
 # Capture screenshot from html page
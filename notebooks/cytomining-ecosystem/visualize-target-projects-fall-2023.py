@@ -19,13 +19,11 @@
 
 # +
 import asyncio
-import itertools
+import collections
 import os
 import pathlib
-import random
 import re
 import shutil
-from datetime import datetime
 
 import duckdb
 import nest_asyncio
@@ -38,24 +36,21 @@ import plotly.colors as pc
 import plotly.express as px
 import plotly.graph_objects as go
 import plotly.io as pio
-import pytz
 import pyvis
 from box import Box
 from IPython.display import IFrame
 from itables import to_html_datatable
 from pandas.api.types import CategoricalDtype
-from plotly.offline import plot
+from plotly.offline import get_plotlyjs_version, plot
 from plotly.subplots import make_subplots
 from pyppeteer import launch
 from pyvis.network import Network
-from ydata_profiling import ProfileReport
 
-# set plotly default theme
-pio.templates.default = "simple_white"
-
-# get the current datetime
-tz = pytz.timezone("UTC")
-current_datetime = datetime.now(tz)
+# set plotly default theme, including a common figure size for this report
+pio.templates["landscape"] = go.layout.Template(
+    layout=go.Layout(width=1200, height=500)
+)
+pio.templates.default = "simple_white+landscape"
 
 # set common str's
 title_prefix = "Cytomining Ecosystem Target Software Analysis"
@@ -94,7 +89,7 @@ section_descriptions = {
 }
 # -
 
-# read data from various files
+# read data from various files, selecting only the columns used within this notebook
 with duckdb.connect() as ddb:
     tgt_software_df = ddb.query(
         f"""
@@ -103,29 +98,18 @@ with duckdb.connect() as ddb:
         pubstats."Date Created Year",
         pubstats."google_scholar_count",
         pubstats."biorxiv_count",
-        pubstats."total_pub_count",
-        pubstats."total_pub_count_non_record_linked",
         pkgstats.pypi_downloads_total_unnested AS pypi_downloads_total,
         pkgstats.pypi_downloads_by_month,
         pkgstats.pypi_downloads_monthly_average,
-        pkgstats.pypi_downloads_monthly_median,
         pkgstats.conda_downloads_total,
         pkgstats.conda_downloads_by_month,
         pkgstats.conda_downloads_monthly_average,
-        pkgstats.conda_downloads_monthly_median,
         ghstats."GitHub Stars",
         ghstats."GitHub Contributor Total Count",
-        ghstats."GitHub Network Count",
         ghstats."GitHub Code Search Used By",
         ghstats."GitHub Dependents",
-        ghstats."GitHub Dependency Graph Dependents Count",
-        ghstats."GitHub Code Search Dependents Count",
         ghstats."GitHub Total Dependents Count",
-        ghstats."GitHub Stargazers Count by Month",
-        ghstats."GitHub Stargazers Count by Month Average",
-        ghstats."GitHub Stargazers Count by Month Median",
-        ghstats."GitHub Stargazers Count by Year Average",
-        ghstats."GitHub Stargazers Count by Year Median"
+        ghstats."GitHub Stargazers Count by Month"
     FROM read_parquet('data/loi-target-project-package-metrics.parquet') as pkgstats
     JOIN read_parquet('data/loi-target-project-github-metrics.parquet') as ghstats ON
         pkgstats."Project Name" = ghstats."Project Name"
@@ -183,8 +167,6 @@ fig_packages = px.bar(
     x=["pypi_downloads_total", "conda_downloads_total"],
     y="Project Name",
     orientation="h",
-    width=1200,
-    height=500,
     color_discrete_sequence=[category_color_sequence[2], category_color_sequence[0]],
 )
 
@@ -231,8 +213,6 @@ fig_pypi_monthly = px.line(
     x="download_month",
     y="download_count",
     color="Project Name",
-    width=1200,
-    height=500,
     markers=True,
     symbol_sequence=["square"],
     color_discrete_sequence=[project_color_sequence[0], project_color_sequence[2]],
@@ -280,8 +260,6 @@ fig_conda_monthly = px.line(
     x="download_month",
     y="download_count",
     color="Project Name",
-    width=1200,
-    height=500,
     markers=True,
     symbol_sequence=["diamond"],
     color_discrete_sequence=[project_color_sequence[0], project_color_sequence[1]],
@@ -318,8 +296,6 @@ fig_dependents_count = px.bar(
     x="GitHub Total Dependents Count",
     y="Project Name",
     orientation="h",
-    width=1200,
-    height=500,
     color_discrete_sequence=[pc.qualitative.Vivid[2]],
 )
 
@@ -502,8 +478,6 @@ fig_stars_monthly = px.line(
     y="star_count",
     color="Project Name",
     markers=True,
-    width=1200,
-    height=500,
     symbol_sequence=["star"],
     color_discrete_sequence=project_color_sequence,
 )
@@ -542,8 +516,6 @@ fig_stars_monthly_cumulative_sum = px.line(
     y="star_count_cumulative_sum",
     color="Project Name",
     markers=True,
-    width=1200,
-    height=500,
     symbol_sequence=["star"],
     color_discrete_sequence=project_color_sequence,
 )
@@ -572,23 +544,40 @@ fig_stars_monthly_cumulative_sum.show()
 # -
 
 # organize figures by their sections and the order in which they appeared in this notebook
-fig_collection_grouped = {
-    key: [
+# (sections need not be contiguous within the figure collection)
+fig_collection_grouped = collections.defaultdict(list)
+for entry in fig_collection:
+    fig_collection_grouped[entry["section"]].append(
         {
             "plot": entry["plot"],
             "description": entry["description"],
             "findings": entry["findings"],
         }
-        for entry in group
-    ]
-    for key, group in itertools.groupby(fig_collection, key=lambda x: x["section"])
-}
+    )
 fig_collection_grouped.keys()
 
-cdn_included = False
-with open(f"{export_dir}/target-project-report.html", "w") as f:
-    f.write(
-        """
+
+def plotly_figure_to_html(figure: go.Figure, div_id: str) -> str:
+    """
+    Renders a plotly figure as an empty div and a script which draws
+    the figure json using plotly.js as loaded once within the page head.
+    """
+
+    # skip validation as figures were validated when they were built, and
+    # escape closing tags within the json to avoid ending the script early
+    figure_json = pio.to_json(figure, validate=False).replace("</", "<\\/")
+    return f"""
+    <div id="{div_id}" class="plotly-graph-div" style="height:100%; width:100%;"></div>
+    <script type="text/javascript">
+        Plotly.newPlot("{div_id}", Object.assign({figure_json}, {{"config": {{"responsive": true}}}}));
+    </script>
+    """
+
+
+# gather the report html in parts to write them to file all at once
+report_parts = []
+report_parts.append(
+    f"""
 <html>
 <!-- referenced with modifications from example work on: https://github.com/KrauseFx/markdown-to-html-github-style -->
 
@@ -597,6 +586,7 @@ with open(f"{export_dir}/target-project-report.html", "w") as f:
     <meta name="viewport" content="width=device-width, initial-scale=1">
     <meta charset="UTF-8">
     <link rel="stylesheet" href="../css/style.css">
+    <script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>
 </head>
 
 <body>
@@ -610,130 +600,131 @@ with open(f"{export_dir}/target-project-report.html", "w") as f:
                 href="https://github.com/WayScience/software-landscape-analysis">https://github.com/WayScience/software-landscape-analysis</a>.
         </p>
     """
-    )
+)
 
-    for section, figures in fig_collection_grouped.items():
-        f.write(f"<h2>{section}</h2>")
-        f.write(f"<p>{section_descriptions[section]}</p>")
-        f.write(f"<br><br>")
-        for figure in figures:
-            # if working with plotly figure
-            if isinstance(figure["plot"], plotly.graph_objs._figure.Figure):
-                f.write(
-                    figure["plot"].to_html(
-                        full_html=False,
-                        include_plotlyjs="cdn" if not cdn_included else False,
-                    )
+for section, figures in fig_collection_grouped.items():
+    report_parts.append(f"<h2>{section}</h2>")
+    report_parts.append(f"<p>{section_descriptions[section]}</p>")
+    report_parts.append(f"<br><br>")
+    for figure in figures:
+        # if working with plotly figure
+        if isinstance(figure["plot"], plotly.graph_objs._figure.Figure):
+            report_parts.append(
+                plotly_figure_to_html(
+                    figure=figure["plot"], div_id=f"plot-{len(report_parts)}"
                 )
-            # if working with pyvis graph
-            elif isinstance(figure["plot"], pyvis.network.Network):
-                # write the network plot to docs dir
-                figure["plot"].show(f"{export_dir}/{figure['plot'].html_export_loc}")
-
-                # copy the dependencies of the work to docs dir
-                try:
-                    shutil.copytree(
-                        src="./lib", dst=f"{export_dir}/lib", dirs_exist_ok=True
-                    )
-                except:
-                    continue
-
-                # use an iframe to display the result within the same page as other figures
-                f.write(
-                    f"""
+            )
+        # if working with pyvis graph
+        elif isinstance(figure["plot"], pyvis.network.Network):
+            # write the network plot to docs dir
+            figure["plot"].show(f"{export_dir}/{figure['plot'].html_export_loc}")
+
+            # copy the dependencies of the work to docs dir
+            try:
+                shutil.copytree(
+                    src="./lib", dst=f"{export_dir}/lib", dirs_exist_ok=True
+                )
+            except:
+                continue
+
+            # use an iframe to display the result within the same page as other figures
+            report_parts.append(
+                f"""
                     <br><br>
                     <span style='font-size:1.17em'>{figure['plot'].html_plot_title} (click and scroll with mouse to interact)</span>
                     <iframe src="{figure['plot'].html_export_loc}"
                      style="overflow:hidden;width:1201px;height:520px;border:0px;">Browser not compatible with iframe rendering.</iframe>
                     <br><br>
                     """
-                )
+            )
 
-                # correct the file for invalid html
-                def fix_html(
-                    file_path,
-                    strs_to_replace=[
-                        "<h1></h1>",
-                        "<center>",
-                        "</center>",
-                    ],
-                ):
-                    with open(file_path, "r") as file:
-                        lines = [
-                            re.sub(
-                                "|".join(map(re.escape, strs_to_replace)),
-                                "",
-                                line.replace(
-                                    "<head>",
-                                    "<head><title>Cytomining Ecosystem Target Project Dependents Graph</title>",
-                                ),
-                            )
-                            for replace_str in strs_to_replace
-                            for line in file
-                        ]
-
-                    with open(file_path, "w") as file:
-                        file.writelines(lines)
-
-                fix_html(f"{export_dir}/{figure['plot'].html_export_loc}")
-
-            else:
-                raise Exception("Unknown plot type used.")
-
-            f.write(
-                f"""
+            # correct the file for invalid html
+            def fix_html(
+                file_path,
+                strs_to_replace=[
+                    "<h1></h1>",
+                    "<center>",
+                    "</center>",
+                ],
+            ):
+                with open(file_path, "r") as file:
+                    lines = [
+                        re.sub(
+                            "|".join(map(re.escape, strs_to_replace)),
+                            "",
+                            line.replace(
+                                "<head>",
+                                "<head><title>Cytomining Ecosystem Target Project Dependents Graph</title>",
+                            ),
+                        )
+                        for replace_str in strs_to_replace
+                        for line in file
+                    ]
+
+                with open(file_path, "w") as file:
+                    file.writelines(lines)
+
+            fix_html(f"{export_dir}/{figure['plot'].html_export_loc}")
+
+        else:
+            raise Exception("Unknown plot type used.")
+
+        report_parts.append(
+            f"""
             <ul>
             <li><strong>Description:</strong> {figure['description']}</li>
             <li><strong>Findings:</strong> {figure['findings']}</li>
             </ul>
             """
-            )
-            cdn_included = True
+        )
 
-    f.write(
-        """
+report_parts.append(
+    """
         <h2>Table with selected dataset columns</h2>
         <p>The table below may be used to search and view a selected number of columns from the dataset.</p>
         """
-    )
+)
 
-    # rename columns for visibility
-    tgt_software_df = tgt_software_df.rename(
-        columns={
-            "google_scholar_count": "Google Scholar Count",
-            "biorxiv_count": "bioRxiv Count",
-            "pypi_downloads_total": "PyPI Downloads Total",
-            "pypi_downloads_monthly_average": "PyPI Downloads Monthly Avg",
-            "conda_downloads_total": "Conda Downloads Total",
-            "conda_downloads_monthly_average": "Conda Downloads Monthly Avg",
-        }
-    )
+# rename columns for visibility
+tgt_software_df = tgt_software_df.rename(
+    columns={
+        "google_scholar_count": "Google Scholar Count",
+        "biorxiv_count": "bioRxiv Count",
+        "pypi_downloads_total": "PyPI Downloads Total",
+        "pypi_downloads_monthly_average": "PyPI Downloads Monthly Avg",
+        "conda_downloads_total": "Conda Downloads Total",
+        "conda_downloads_monthly_average": "Conda Downloads Monthly Avg",
+    }
+)
 
-    # write an itable to the page
-    f.write(
-        to_html_datatable(
-            tgt_software_df[
-                [
-                    "Project Name",
-                    "Date Created Year",
-                    "Google Scholar Count",
-                    "bioRxiv Count",
-                    "PyPI Downloads Total",
-                    "PyPI Downloads Monthly Avg",
-                    "Conda Downloads Total",
-                    "Conda Downloads Monthly Avg",
-                    "GitHub Stars",
-                    "GitHub Contributor Total Count",
-                    "GitHub Total Dependents Count",
-                ]
-            ],
-            style="height:600px;float:left;",
-            classes="display",
-            maxBytes=0,
-            # fix a malformed attributes error built into the html content
-        ).replace('class="display"style="', 'class="display" style="')
-    )
-    f.write("</div></body></html>")
+# write an itable to the page
+report_parts.append(
+    to_html_datatable(
+        tgt_software_df[
+            [
+                "Project Name",
+                "Date Created Year",
+                "Google Scholar Count",
+                "bioRxiv Count",
+                "PyPI Downloads Total",
+                "PyPI Downloads Monthly Avg",
+                "Conda Downloads Total",
+                "Conda Downloads Monthly Avg",
+                "GitHub Stars",
+                "GitHub Contributor Total Count",
+                "GitHub Total Dependents Count",
+            ]
+        ],
+        style="height:600px;float:left;",
+        classes="display",
+        maxBytes=0,
+        # fix a malformed attributes error built into the html content
+    ).replace('class="display"style="', 'class="display" style="')
+)
+report_parts.append("</div></body></html>")
+
+with open(f"{export_dir}/target-project-report.html", "w") as f:
+    f.writelines(report_parts)
 
 # +
 # capture the html page as a png export as a backup
@@ -746,13 +737,17 @@ nest_asyncio.apply()
 # see: https://github.com/pyppeteer/pyppeteer#examples
 async def capture_screenshot(file_path, output_path):
     browser = await launch(headless=True)
-    page = await browser.newPage()
-    # set the size of the capture
-    await page.setViewport({"width": 1400, "height": 6500})
-    await page.goto(f"file://{file_path}")
-    await page.waitFor(1000)
-    await page.screenshot({"path": output_path})
-    await browser.close()
+    try:
+        page = await browser.newPage()
+        # set the size of the capture
+        await page.setViewport({"width": 1400, "height": 6500})
+        # wait for plotly.js and other page resources to finish loading
+        # instead of waiting on a fixed delay
+        await page.goto(f"file://{file_path}", waitUntil="networkidle0")
+        await page.screenshot({"path": output_path})
+    finally:
+        # close the browser process even where the capture fails
+        await browser.close()
 
 
 # Capture screenshot from html page